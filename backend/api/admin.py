@@ -1,6 +1,10 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from rest_framework.exceptions import ValidationError
 
-from .models import Cart, Favorite, Ingredient, Recipe, RecipeIngredient, Tag
+from .images import IMAGE_ERRORS, open_image, save_image_variants
+from .models import (Cart, Favorite, Ingredient, Recipe, RecipeImageJob,
+                     RecipeIngredient, Tag)
 
 
 @admin.register(Tag)
@@ -37,10 +41,28 @@ class IngredientsInline(admin.TabularInline):
     min_num = 1
 
 
+class RecipeAdminForm(forms.ModelForm):
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if 'image' in self.changed_data and image:
+            try:
+                open_image(image)
+            except IMAGE_ERRORS as error:
+                raise forms.ValidationError(
+                    f'Не удалось обработать изображение: {error}'
+                )
+            finally:
+                image.seek(0)
+        return image
+
+
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     """Страница рецептов в админке."""
 
+    form = RecipeAdminForm
+
     list_display = (
         'pk',
         'author',
@@ -60,8 +82,22 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ('author', 'tags')
     empty_value_display = '-пусто-'
 
+    readonly_fields = ('image_status',)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            try:
+                save_image_variants(obj)
+            except ValidationError as error:
+                self.message_user(
+                    request,
+                    error.detail['image'],
+                    messages.ERROR
+                )
+
     def is_favorited(self, obj):
-        return obj.fav_recipes.count()
+        return obj.favorites_count
 
     def get_ingredients(self, obj):
         return "\n".join([ing.name for ing in obj.ingredients.all()])
@@ -121,3 +157,20 @@ class CartAdmin(admin.ModelAdmin):
     search_fields = ('owner__email', 'recipe__name')
     list_filter = ('recipe__tags',)
     empty_value_display = '-пусто-'
+
+
+@admin.register(RecipeImageJob)
+class RecipeImageJobAdmin(admin.ModelAdmin):
+    """Очередь обработки фото рецептов."""
+
+    list_display = (
+        'pk',
+        'recipe',
+        'status',
+        'created',
+        'updated',
+        'error'
+    )
+    exclude = ('payload',)
+    list_filter = ('status',)
+    empty_value_display = '-пусто-'
@@ -0,0 +1,288 @@
+import base64
+import io
+import json
+import math
+import statistics
+import subprocess
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from .models import Cart, Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+def percentile(values, percent):
+    """Процентиль методом ближайшего ранга."""
+    values = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def get_image_payload():
+    buffer = io.BytesIO()
+    Image.new('RGB', (800, 600), '#c0ffee').save(buffer, 'JPEG')
+    return (
+        'data:image/jpeg;base64,'
+        + base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+def get_context():
+    """Пользователь с избранным, покупками и подписками и его рецепт."""
+    cart = Cart.objects.filter(
+        owner__owner_of_fav__isnull=False,
+        owner__subscriber__isnull=False,
+        owner__recipes__isnull=False
+    ).select_related('owner').first()
+    if cart is None:
+        return None
+    user = cart.owner
+    tags = list(Tag.objects.values_list('pk', 'slug')[:2])
+    ingredients = list(Ingredient.objects.values_list('pk', 'name')[:3])
+    return {
+        'token': Token.objects.get_or_create(user=user)[0].key,
+        'recipe': Recipe.objects.filter(author=user).first(),
+        'author': user.subscriber.values_list('author_id', flat=True)[0],
+        'tags': tags,
+        'ingredients': ingredients,
+    }
+
+
+def get_scenarios(context):
+    """
+    Сценарии: (название, метод, адрес, тело, нужна ли авторизация).
+
+    Запросы на запись выполняются в транзакции, которая откатывается,
+    поэтому данные между повторами не меняются.
+    """
+    recipe = context['recipe']
+    (tag_id, tag), (second_tag_id, second_tag) = context['tags']
+    ingredient_ids = [pk for pk, _ in context['ingredients']]
+    ingredients = [{'id': pk, 'amount': 10} for pk in ingredient_ids]
+    recipe_data = {
+        'name': 'Бенчмарк',
+        'text': 'Рецепт для замера производительности',
+        'cooking_time': 15,
+        'tags': [tag_id, second_tag_id],
+        'ingredients': ingredients,
+    }
+    pantry = ','.join(map(str, ingredient_ids))
+    return (
+        ('recipes_list_anonymous', 'get', '/api/recipes/', None, False),
+        ('recipes_list', 'get', '/api/recipes/', None, True),
+        (
+            'recipes_list_cursor',
+            'get',
+            '/api/recipes/?pagination=cursor',
+            None,
+            True
+        ),
+        (
+            'recipes_filter_author',
+            'get',
+            f'/api/recipes/?author={context["author"]}',
+            None,
+            True
+        ),
+        (
+            'recipes_filter_tag',
+            'get',
+            f'/api/recipes/?tags={tag}',
+            None,
+            True
+        ),
+        (
+            'recipes_filter_tags',
+            'get',
+            f'/api/recipes/?tags={tag}&tags={second_tag}',
+            None,
+            True
+        ),
+        (
+            'recipes_filter_favorited',
+            'get',
+            '/api/recipes/?is_favorited=1',
+            None,
+            True
+        ),
+        (
+            'recipes_filter_cart',
+            'get',
+            '/api/recipes/?is_in_shopping_cart=1',
+            None,
+            True
+        ),
+        (
+            'recipes_search',
+            'get',
+            f'/api/recipes/?search={recipe.name.split()[0]}',
+            None,
+            True
+        ),
+        ('recipe_detail', 'get', f'/api/recipes/{recipe.pk}/', None, True),
+        ('recipe_create', 'post', '/api/recipes/', {
+            **recipe_data,
+            'image': get_image_payload(),
+        }, True),
+        (
+            'recipe_patch',
+            'patch',
+            f'/api/recipes/{recipe.pk}/',
+            recipe_data,
+            True
+        ),
+        (
+            'download_shopping_cart',
+            'get',
+            '/api/recipes/download_shopping_cart/',
+            None,
+            True
+        ),
+        (
+            'subscriptions',
+            'get',
+            '/api/users/subscriptions/?recipes_limit=3',
+            None,
+            True
+        ),
+        (
+            'ingredient_search',
+            'get',
+            f'/api/ingredients/?name={context["ingredients"][0][1][:3]}',
+            None,
+            False
+        ),
+        (
+            'recipes_pantry',
+            'get',
+            f'/api/recipes/pantry/?ingredients={pantry}',
+            None,
+            True
+        ),
+        (
+            'recipes_recommended',
+            'get',
+            '/api/recipes/recommended/',
+            None,
+            True
+        ),
+        ('recipes_feed', 'get', '/api/recipes/feed/', None, True),
+    )
+
+
+def send(client, method, path, payload):
+    if payload is None:
+        response = getattr(client, method)(path)
+    else:
+        response = getattr(client, method)(
+            path,
+            json.dumps(payload),
+            content_type='application/json'
+        )
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def run_scenario(client, method, path, payload, repeat, warmup):
+    timings = []
+    queries = []
+    for number in range(warmup + repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            if method == 'get':
+                response = send(client, method, path, payload)
+            else:
+                with transaction.atomic():
+                    response = send(client, method, path, payload)
+                    transaction.set_rollback(True)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{method.upper()} {path}: {response.status_code} '
+                f'{response.content[:200]!r}'
+            )
+        if number >= warmup:
+            timings.append(elapsed * 1000)
+            queries.append(len(captured))
+    return {
+        'requests': repeat,
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': max(queries),
+        'throughput_rps': round(repeat / (sum(timings) / 1000), 1),
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True,
+            check=True,
+            text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(repeat=20, warmup=2, names=None, stdout=None,
+                   baseline=None):
+    context = get_context()
+    if context is None:
+        raise CommandError(
+            'Нет пользователя с избранным, покупками, подписками и '
+            'рецептами. Запустите seed_data.'
+        )
+    clients = {
+        False: Client(),
+        True: Client(HTTP_AUTHORIZATION=f'Token {context["token"]}'),
+    }
+    results = {}
+    for name, method, path, payload, auth in get_scenarios(context):
+        if names and not any(part in name for part in names):
+            continue
+        results[name] = run_scenario(
+            clients[auth], method, path, payload, repeat, warmup
+        )
+        if stdout is not None:
+            stdout.write(format_result(
+                name,
+                results[name],
+                (baseline or {}).get(name)
+            ))
+    return {
+        'commit': get_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'database': connection.vendor,
+        'recipes': Recipe.objects.count(),
+        'users': User.objects.count(),
+        'repeat': repeat,
+        'scenarios': results,
+    }
+
+
+def format_result(name, result, baseline=None):
+    line = (
+        f'{name:<28} p50 {result["p50_ms"]:8.2f} мс  '
+        f'p95 {result["p95_ms"]:8.2f} мс  '
+        f'запросов {result["queries"]:3}  '
+        f'{result["throughput_rps"]:8.1f} rps'
+    )
+    if baseline:
+        change = (result['p50_ms'] / baseline['p50_ms'] - 1) * 100
+        line += (
+            f'  p50 {change:+.0f}%, '
+            f'запросов {result["queries"] - baseline["queries"]:+d}'
+        )
+    return line
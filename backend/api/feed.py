@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.db.models import Max, Q
+from users.models import Subscribe
+
+from .models import FeedItem, Recipe
+from .utils import batched
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def add_to_feeds(user_ids, recipes):
+    items = (
+        FeedItem(user_id=user_id, recipe=recipe, pub_date=recipe.pub_date)
+        for user_id in user_ids
+        for recipe in recipes
+    )
+    for batch in batched(items, FANOUT_BATCH_SIZE):
+        FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_recipe(recipe):
+    """
+    Кладет новый рецепт в ленты подписчиков автора.
+
+    Рецепты авторов, у которых подписчиков больше FEED_FANOUT_LIMIT,
+    не раскладываются при записи: подписчики забирают их при чтении
+    ленты в pull_large_authors.
+    """
+    if recipe.author.subscribers_count > settings.FEED_FANOUT_LIMIT:
+        return
+    follower_ids = Subscribe.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True)
+    add_to_feeds(follower_ids.iterator(), (recipe,))
+
+
+def backfill_feed(user, author_id):
+    """Добавляет в ленту последние рецепты нового автора из подписок."""
+    recipes = Recipe.objects.filter(author_id=author_id).only('pk', 'pub_date')
+    add_to_feeds((user.pk,), recipes[:settings.FEED_BACKFILL_SIZE])
+
+
+def remove_from_feed(user, author):
+    FeedItem.objects.filter(user=user, recipe__author=author).delete()
+
+
+def pull_large_authors(user):
+    """
+    Дозаполняет ленту новыми рецептами популярных авторов из подписок.
+
+    Забираются все рецепты новее последнего уже полученного, от старых
+    к новым, пачками по FANOUT_BATCH_SIZE. Если из этих авторов в ленте
+    еще ничего нет, добавляются их FEED_BACKFILL_SIZE последних
+    рецептов, как при подписке.
+    """
+    author_ids = list(
+        Subscribe.objects.filter(
+            user=user,
+            author__subscribers_count__gt=settings.FEED_FANOUT_LIMIT
+        ).values_list('author_id', flat=True)
+    )
+    if not author_ids:
+        return
+    latest = FeedItem.objects.filter(
+        user=user,
+        recipe__author__in=author_ids
+    ).aggregate(latest=Max('pub_date'))['latest']
+    recipes = Recipe.objects.filter(author__in=author_ids).only(
+        'pk',
+        'pub_date'
+    )
+    if latest is None:
+        add_to_feeds((user.pk,), recipes[:settings.FEED_BACKFILL_SIZE])
+        return
+    recipes = recipes.filter(pub_date__gt=latest).order_by('pub_date', 'pk')
+    page = list(recipes[:FANOUT_BATCH_SIZE])
+    while page:
+        add_to_feeds((user.pk,), page)
+        if len(page) < FANOUT_BATCH_SIZE:
+            break
+        last = page[-1]
+        page = list(recipes.filter(
+            Q(pub_date__gt=last.pub_date)
+            | Q(pub_date=last.pub_date, pk__gt=last.pk)
+        )[:FANOUT_BATCH_SIZE])
+
+
+def get_feed(user):
+    pull_large_authors(user)
+    return FeedItem.objects.filter(user=user)
@@ -1,19 +1,10 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Exists, F, OuterRef
+from django.db.models.expressions import RawSQL
 from django_filters import rest_framework as django_filters
 
-from .models import Ingredient, Recipe
-
-
-class IngredientFilter(django_filters.FilterSet):
-    """Фильтрсет ингредиентов."""
-
-    name = django_filters.CharFilter(
-        field_name='name',
-        lookup_expr='icontains'
-    )
-
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+from .indexes import recipe_search_index
+from .models import POSTGRES, SEARCH_CONFIG, Cart, Favorite, Recipe, Tag
 
 
 class RecipeFilter(django_filters.FilterSet):
@@ -29,9 +20,13 @@ class RecipeFilter(django_filters.FilterSet):
         field_name='author__id',
         lookup_expr='exact'
     )
-    tags = django_filters.AllValuesMultipleFilter(
+    tags = django_filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
+        to_field_name='slug',
+        queryset=Tag.objects.all(),
+        method='get_tags'
     )
+    search = django_filters.CharFilter(method='get_search')
 
     class Meta:
         model = Recipe
@@ -39,17 +34,58 @@ class RecipeFilter(django_filters.FilterSet):
             'is_favorited',
             'is_in_shopping_cart',
             'author',
-            'tags'
+            'tags',
+            'search'
         )
 
-    def get_is_favorited(self, queryset, name, value):
+    def filter_by_user_list(self, queryset, model, value):
+        if not value:
+            return queryset
         cur_user = self.request.user
-        if value:
-            return Recipe.objects.filter(fav_recipes__owner=cur_user)
-        return Recipe.objects.all()
+        if cur_user.is_anonymous:
+            return queryset.none()
+        return queryset.filter(Exists(
+            model.objects.filter(owner=cur_user, recipe=OuterRef('pk'))
+        ))
+
+    def get_is_favorited(self, queryset, name, value):
+        return self.filter_by_user_list(queryset, Favorite, value)
 
     def get_is_in_shopping_cart(self, queryset, name, value):
-        cur_user = self.request.user
-        if value:
-            return Recipe.objects.filter(shop_recipes__owner=cur_user)
-        return Recipe.objects.all()
+        return self.filter_by_user_list(queryset, Cart, value)
+
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'),
+                tag__in=value
+            )
+        ))
+
+    def get_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию и описанию с ранжированием."""
+        if not value.strip():
+            return queryset
+        if POSTGRES:
+            query = SearchQuery(value, config=SEARCH_CONFIG)
+            return queryset.filter(search_vector=query).annotate(
+                rank=SearchRank(F('search_vector'), query)
+            ).order_by('-rank', '-pub_date')
+        recipe_ids = recipe_search_index.search(value)
+        if not recipe_ids:
+            return queryset.none()
+        # Один CASE в сыром SQL: тысяча выражений When строится и
+        # сравнивается ORM заметно дольше, чем выполняется запрос.
+        rank = RawSQL(
+            f'CASE {Recipe._meta.db_table}.id '
+            + 'WHEN %s THEN %s ' * len(recipe_ids)
+            + 'END',
+            [
+                param
+                for position, recipe_id in enumerate(recipe_ids)
+                for param in (recipe_id, position)
+            ]
+        )
+        return queryset.filter(pk__in=recipe_ids).order_by(rank)
@@ -0,0 +1,184 @@
+import io
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image, ImageOps
+from rest_framework.exceptions import ValidationError
+
+from .models import Recipe, RecipeImageJob
+
+logger = logging.getLogger(__name__)
+
+# Обрезанный или поврежденный файл, слишком большое изображение.
+IMAGE_ERRORS = (OSError, Image.DecompressionBombError)
+
+EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'WEBP': 'webp',
+    'GIF': 'gif',
+}
+
+
+def encode_image(image, image_format, size=None):
+    """Кодирует копию изображения без метаданных (EXIF, ICC, комментариев)."""
+    image = image.copy()
+    if size is not None:
+        image.thumbnail(size, Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+        image = image.convert('RGBA')
+    buffer = io.BytesIO()
+    image.save(
+        buffer,
+        image_format,
+        quality=settings.RECIPE_IMAGE_QUALITY,
+        optimize=size is not None
+    )
+    return ContentFile(buffer.getvalue())
+
+
+def open_image(file):
+    """Полностью декодирует изображение: Image.open читает только заголовок."""
+    image = Image.open(file)
+    original_format = image.format if image.format in EXTENSIONS else 'PNG'
+    image.load()
+    return ImageOps.exif_transpose(image), original_format
+
+
+def save_image_variants(recipe, source=None):
+    """
+    Декодирует фото рецепта один раз, очищает его от метаданных
+    и сохраняет рядом уменьшенные варианты для превью и карточки.
+
+    source - только что загруженный файл; без него обрабатывается
+    уже сохраненное фото. Старые файлы не удаляются: хранилище общее
+    для одинаковых фото, сироты убирает collect_media_garbage.
+    Битое изображение (например, обрезанный JPEG) дает ValidationError.
+    """
+    if source is None:
+        source = recipe.image
+    base_name = os.path.splitext(os.path.basename(source.name))[0]
+    variant_format = settings.RECIPE_IMAGE_FORMAT
+    variant_sizes = {
+        'image_preview': settings.RECIPE_IMAGE_PREVIEW_SIZE,
+        'image_card': settings.RECIPE_IMAGE_CARD_SIZE,
+    }
+    try:
+        with source.open('rb') as file:
+            image, original_format = open_image(file)
+        files = {
+            'image': (
+                f'{base_name}.{EXTENSIONS[original_format]}',
+                encode_image(image, original_format)
+            ),
+        }
+        for field_name, size in variant_sizes.items():
+            files[field_name] = (
+                f'{base_name}.{EXTENSIONS[variant_format]}',
+                encode_image(image, variant_format, size)
+            )
+    except IMAGE_ERRORS as error:
+        raise ValidationError(
+            {'image': f'Не удалось обработать изображение: {error}'}
+        )
+    for field_name, (name, content) in files.items():
+        getattr(recipe, field_name).save(name, content, save=False)
+    recipe.save(update_fields=tuple(files))
+
+
+def save_recipe_image(recipe, image):
+    """Сохраняет фото сразу или ставит его в очередь на обработку."""
+    if settings.RECIPE_IMAGE_BACKGROUND:
+        RecipeImageJob.objects.update_or_create(
+            recipe=recipe,
+            defaults={
+                'payload': image,
+                'status': RecipeImageJob.PENDING,
+                'error': ''
+            }
+        )
+        recipe.image_status = Recipe.IMAGE_PENDING
+        recipe.save(update_fields=('image_status',))
+        return
+    save_image_variants(recipe, image)
+
+
+def claim_image_jobs(batch_size, stale_after):
+    """Забирает пачку заданий, не блокируя другие воркеры."""
+    RecipeImageJob.objects.filter(
+        status=RecipeImageJob.PROCESSING,
+        updated__lt=timezone.now() - timedelta(seconds=stale_after)
+    ).update(status=RecipeImageJob.PENDING)
+    with transaction.atomic():
+        jobs = list(
+            RecipeImageJob.objects.select_for_update(
+                skip_locked=True
+            ).filter(status=RecipeImageJob.PENDING)[:batch_size]
+        )
+        RecipeImageJob.objects.filter(
+            pk__in=[job.pk for job in jobs]
+        ).update(status=RecipeImageJob.PROCESSING, updated=timezone.now())
+    return jobs
+
+
+def get_error_message(error):
+    if isinstance(error, DjangoValidationError):
+        return '; '.join(error.messages)
+    if isinstance(error, ValidationError):
+        detail = error.detail
+        if isinstance(detail, dict):
+            detail = detail.values()
+        return '; '.join(map(str, detail))
+    return f'{type(error).__name__}: {error}'
+
+
+def fail_image_job(job, error):
+    job.status = RecipeImageJob.FAILED
+    job.error = get_error_message(error)
+    if RecipeImageJob.objects.filter(
+            pk=job.pk,
+            status=RecipeImageJob.PROCESSING
+    ).update(status=job.status, error=job.error, updated=timezone.now()):
+        Recipe.objects.filter(pk=job.recipe_id).update(
+            image_status=Recipe.IMAGE_FAILED
+        )
+
+
+def process_image_job(job):
+    """
+    Декодирует фото из задания, сохраняет его и варианты.
+
+    Любая ошибка помечает задание и рецепт как failed: иначе задание
+    осталось бы в processing, вернулось бы в очередь и снова роняло
+    обработчик.
+    """
+    recipe = job.recipe
+    try:
+        image = Base64ImageField().to_internal_value(job.payload)
+        save_image_variants(recipe, image)
+    except Exception as error:
+        if not isinstance(error, (DjangoValidationError, ValidationError)):
+            logger.exception(
+                'Не удалось обработать фото рецепта %s', recipe.pk
+            )
+        fail_image_job(job, error)
+        return False
+    # Пока шла обработка, могли прислать новое фото - тогда задание
+    # снова в очереди и удалять его нельзя.
+    if RecipeImageJob.objects.filter(
+            pk=job.pk,
+            status=RecipeImageJob.PROCESSING
+    ).delete()[0]:
+        Recipe.objects.filter(pk=recipe.pk).update(
+            image_status=Recipe.IMAGE_READY
+        )
+    return True
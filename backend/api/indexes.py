@@ -0,0 +1,419 @@
+import heapq
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from functools import lru_cache
+from itertools import chain
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .mixins import get_reference_version
+from .models import Ingredient, Recipe, RecipeIngredient
+
+WORD_RE = re.compile(r'\w+')
+RUSSIAN_ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'иях', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ешь', 'ете', 'ите', 'ать', 'ять', 'ить', 'еть', 'ует', 'ают', 'яют',
+    'ией', 'ий', 'ый', 'ой', 'ей', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие',
+    'ых', 'их', 'ую', 'юю', 'ом', 'ем', 'ам', 'ям', 'ах', 'ях', 'ов', 'ев',
+    'ью', 'ия', 'ии', 'ть', 'ут', 'ют', 'ит', 'ет',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+MIN_STEM_LENGTH = 3
+SEARCH_RESULTS_LIMIT = 1000
+NAME_WEIGHT = 1.0
+TEXT_WEIGHT = 0.4
+INGREDIENT_CHANGES_TIMEOUT = 24 * 60 * 60
+INGREDIENT_CHANGES_LIMIT = 10000
+INGREDIENT_CHANGES_GAP_SECONDS = 60
+
+
+@lru_cache(maxsize=100000)
+def stem(word):
+    """Упрощенный стемминг: отрезает типичное русское окончание."""
+    word = word.lower().replace('ё', 'е')
+    for ending in RUSSIAN_ENDINGS:
+        if (
+            word.endswith(ending)
+            and len(word) - len(ending) >= MIN_STEM_LENGTH
+        ):
+            return word[:-len(ending)]
+    return word
+
+
+def get_terms(text):
+    return [stem(word) for word in WORD_RE.findall(text)]
+
+
+class InMemoryIndex:
+    """
+    Индекс в памяти процесса.
+
+    Строится при первом обращении и перестраивается после invalidate()
+    или по истечении INDEX_REFRESH_SECONDS, чтобы подхватить изменения,
+    сделанные в других воркерах.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._built_at = 0
+
+    def build(self):
+        raise NotImplementedError
+
+    def is_expired(self):
+        return (
+            self._data is None
+            or time.monotonic() - self._built_at
+            > settings.INDEX_REFRESH_SECONDS
+        )
+
+    def get_data(self):
+        if self.is_expired():
+            with self._lock:
+                if self.is_expired():
+                    self._data = self.build()
+                    self._built_at = time.monotonic()
+        return self._data
+
+    def invalidate(self):
+        self._data = None
+
+
+class IngredientIndex(InMemoryIndex):
+    """
+    Поиск ингредиентов: сначала совпадения по началу названия.
+
+    Индекс помнит версию справочника ингредиентов, с которой построен,
+    и перестраивается, как только она изменится в общем кэше. Иначе
+    воркер отдавал бы старые результаты, а CachedReferenceMixin сохранял
+    бы их под новой версией.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._version = None
+
+    def is_expired(self):
+        return (
+            self._data is None
+            or self._version != get_reference_version('ingredients')
+        )
+
+    def build(self):
+        # Версия читается до загрузки: запись, зафиксированная во время
+        # построения, сменит версию и вызовет еще одну перестройку.
+        self._version = get_reference_version('ingredients')
+        ingredients = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda item: (item['name'].lower(), item['id'])
+        )
+        keys = [ingredient['name'].lower() for ingredient in ingredients]
+        return keys, ingredients
+
+    def search(self, query):
+        keys, ingredients = self.get_data()
+        query = query.lower()
+        position = bisect_left(keys, query)
+        end = position
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        contains = [
+            ingredient
+            for key, ingredient in zip(keys, ingredients)
+            if query in key and not key.startswith(query)
+        ]
+        return ingredients[position:end] + contains
+
+
+class RecipeSearchIndex(InMemoryIndex):
+    """
+    Обратный индекс для поиска рецептов, когда база не PostgreSQL.
+
+    Хранит для каждой основы слова веса рецептов, в которых она
+    встречается; название весит больше описания. Изменения рецептов
+    вносятся в уже построенный индекс без полной перестройки.
+    """
+
+    def get_weights(self, name, text):
+        weights = Counter()
+        for term in get_terms(name):
+            weights[term] += NAME_WEIGHT
+        for term in get_terms(text):
+            weights[term] += TEXT_WEIGHT
+        return weights
+
+    def build(self):
+        postings = {}
+        documents = {}
+        recipes = Recipe.objects.values_list('id', 'name', 'text')
+        for recipe_id, name, text in recipes.iterator():
+            self.add(postings, documents, recipe_id, name, text)
+        return postings, documents
+
+    def add(self, postings, documents, recipe_id, name, text):
+        weights = self.get_weights(name, text)
+        documents[recipe_id] = weights
+        for term, weight in weights.items():
+            postings.setdefault(term, {})[recipe_id] = weight
+
+    def discard(self, postings, documents, recipe_id):
+        for term in documents.pop(recipe_id, ()):
+            posting = postings[term]
+            del posting[recipe_id]
+            if not posting:
+                del postings[term]
+
+    def update(self, recipe_id, name, text):
+        with self._lock:
+            if self._data is not None:
+                self.discard(*self._data, recipe_id)
+                self.add(*self._data, recipe_id, name, text)
+
+    def remove(self, recipe_id):
+        with self._lock:
+            if self._data is not None:
+                self.discard(*self._data, recipe_id)
+
+    def search(self, query, limit=SEARCH_RESULTS_LIMIT):
+        """Id рецептов, содержащих все слова запроса, по убыванию веса."""
+        terms = set(get_terms(query))
+        if not terms:
+            return []
+        postings, _ = self.get_data()
+        # Блокировка защищает от изменения словарей во время обхода.
+        with self._lock:
+            matches = sorted(
+                (postings.get(term, {}) for term in terms),
+                key=len
+            )
+            scores = matches[0]
+            for posting in matches[1:]:
+                scores = {
+                    recipe_id: score + posting[recipe_id]
+                    for recipe_id, score in scores.items()
+                    if recipe_id in posting
+                }
+            return [
+                recipe_id
+                for _, recipe_id in heapq.nlargest(
+                    limit,
+                    zip(scores.values(), scores.keys())
+                )
+            ]
+
+
+def insert_sorted(values, value):
+    position = bisect_left(values, value)
+    if position == len(values) or values[position] != value:
+        values.insert(position, value)
+
+
+def discard_sorted(values, value):
+    position = bisect_left(values, value)
+    if position < len(values) and values[position] == value:
+        del values[position]
+
+
+def set_item(values, recipe_id, value):
+    """values - массив по id рецепта, при необходимости удваивается."""
+    if recipe_id >= len(values):
+        missing = max(recipe_id + 1 - len(values), len(values))
+        values.frombytes(bytes(missing * values.itemsize))
+    values[recipe_id] = value
+
+
+class RecipeIngredientIndex(InMemoryIndex):
+    """
+    Составы рецептов для подбора по имеющимся продуктам.
+
+    Для каждого ингредиента хранится отсортированный array('I') id
+    рецептов, где он нужен. Составы рецептов лежат подряд в одном
+    array('I'), по id рецепта хранятся начало состава и число
+    ингредиентов. Подбор обходит только рецепты, в которых есть хотя
+    бы один из продуктов.
+
+    Индекс строится целиком один раз. Дальше изменения составов всех
+    воркеров пишутся в журнал в кэше (поэтому кэш должен быть общим),
+    и перед подбором воркер перечитывает только изменившиеся рецепты.
+    Полная перестройка нужна, только если журнал потерян.
+    """
+
+    version_key = 'recipe_ingredient_index:version'
+
+    def __init__(self):
+        super().__init__()
+        self._version = 0
+        self._gap_since = None
+        self._stale = 0
+
+    def get_change_key(self, version):
+        return f'recipe_ingredient_index:change:{version}'
+
+    def is_expired(self):
+        return self._data is None
+
+    def build(self):
+        # Версия читается до загрузки: изменения, попавшие в журнал во
+        # время построения, будут применены повторно, а не потеряны.
+        self._version = cache.get(self.version_key, 0)
+        self._gap_since = None
+        self._stale = 0
+        postings = {}
+        sizes = array('H')
+        offsets = array('I')
+        compositions = array('I')
+        rows = RecipeIngredient.objects.order_by('recipe_id').values_list(
+            'recipe_id',
+            'ingredient_id'
+        )
+        recipe_id = None
+        for row_recipe_id, ingredient_id in rows.iterator(chunk_size=10000):
+            if row_recipe_id != recipe_id:
+                recipe_id = row_recipe_id
+                set_item(offsets, recipe_id, len(compositions))
+            # Строки идут по возрастанию id рецепта, массивы сразу
+            # получаются отсортированными.
+            postings.setdefault(ingredient_id, array('I')).append(recipe_id)
+            compositions.append(ingredient_id)
+            set_item(sizes, recipe_id, len(compositions) - offsets[recipe_id])
+        return postings, sizes, offsets, compositions
+
+    def increment_version(self, delta=1):
+        try:
+            return cache.incr(self.version_key, delta)
+        except ValueError:
+            cache.add(self.version_key, 0, None)
+            return cache.incr(self.version_key, delta)
+
+    def record_change(self, recipe_id):
+        """Добавляет рецепт с изменившимся составом в общий журнал."""
+        version = self.increment_version()
+        cache.set(
+            self.get_change_key(version),
+            recipe_id,
+            INGREDIENT_CHANGES_TIMEOUT
+        )
+
+    def reset(self):
+        """Перестраивает индекс во всех воркерах после массовой загрузки."""
+        self.increment_version(INGREDIENT_CHANGES_LIMIT + 1)
+        self.invalidate()
+
+    def sync(self):
+        """Применяет изменения из журнала, сделанные после построения."""
+        version = cache.get(self.version_key, 0)
+        if version == self._version or self._data is None:
+            return
+        with self._lock:
+            if self._data is None:
+                return
+            if (
+                version < self._version
+                or version - self._version > INGREDIENT_CHANGES_LIMIT
+            ):
+                self._data = None
+                return
+            keys = [
+                self.get_change_key(number)
+                for number in range(self._version + 1, version + 1)
+            ]
+            changes = cache.get_many(keys)
+            recipe_ids = set()
+            for key in keys:
+                if key not in changes:
+                    break
+                recipe_ids.add(changes[key])
+                self._version += 1
+            if self._version == version:
+                self._gap_since = None
+            elif self._gap_since is None:
+                # Запись журнала могла еще не успеть сохраниться.
+                self._gap_since = time.monotonic()
+            elif (
+                time.monotonic() - self._gap_since
+                > INGREDIENT_CHANGES_GAP_SECONDS
+            ):
+                self._data = None
+                return
+            if recipe_ids:
+                self.refresh(recipe_ids)
+
+    def refresh(self, recipe_ids):
+        """
+        Перечитывает составы рецептов в построенный индекс.
+
+        Рецепт убирается только из списков ингредиентов, которых в нем
+        больше нет, и добавляется только в списки новых. Новый состав
+        дописывается в конец compositions, место старого освобождает
+        compact().
+        """
+        new_compositions = defaultdict(set)
+        rows = RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient_id')
+        for recipe_id, ingredient_id in rows:
+            new_compositions[recipe_id].add(ingredient_id)
+        postings, sizes, offsets, compositions = self._data
+        for recipe_id in recipe_ids:
+            old = set()
+            if recipe_id < len(sizes):
+                start = offsets[recipe_id]
+                old.update(compositions[start:start + sizes[recipe_id]])
+            new = new_compositions.get(recipe_id, set())
+            for ingredient_id in old - new:
+                discard_sorted(postings[ingredient_id], recipe_id)
+            for ingredient_id in new - old:
+                insert_sorted(
+                    postings.setdefault(ingredient_id, array('I')),
+                    recipe_id
+                )
+            set_item(offsets, recipe_id, len(compositions))
+            compositions.extend(sorted(new))
+            set_item(sizes, recipe_id, len(new))
+            self._stale += len(old)
+        if self._stale > len(compositions) // 2:
+            self.compact()
+
+    def compact(self):
+        """Убирает из compositions старые составы измененных рецептов."""
+        _, sizes, offsets, compositions = self._data
+        compacted = array('I')
+        for recipe_id, size in enumerate(sizes):
+            if size:
+                start = offsets[recipe_id]
+                offsets[recipe_id] = len(compacted)
+                compacted.extend(compositions[start:start + size])
+        compositions[:] = compacted
+        self._stale = 0
+
+    def match(self, ingredient_ids):
+        """
+        Id рецептов, где есть хотя бы один из продуктов: сначала те,
+        что можно приготовить целиком, затем по числу недостающих
+        ингредиентов, внутри группы - новые первыми.
+        """
+        self.sync()
+        postings, sizes, _, _ = self.get_data()
+        with self._lock:
+            matched = Counter(chain.from_iterable(
+                postings.get(ingredient_id, ())
+                for ingredient_id in set(ingredient_ids)
+            ))
+            groups = defaultdict(list)
+            for recipe_id, count in matched.items():
+                groups[sizes[recipe_id] - count].append(recipe_id)
+        recipe_ids = []
+        for missing in sorted(groups):
+            recipe_ids.extend(sorted(groups[missing], reverse=True))
+        return recipe_ids
+
+
+ingredient_index = IngredientIndex()
+recipe_search_index = RecipeSearchIndex()
+recipe_ingredient_index = RecipeIngredientIndex()
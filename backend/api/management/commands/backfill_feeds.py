@@ -0,0 +1,24 @@
+from api.feed import backfill_feed
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from users.models import Subscribe
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет ленты подписок последними рецептами авторов '
+        '(FEED_BACKFILL_SIZE на каждую подписку) для уже существующих '
+        'подписок.'
+    )
+
+    def handle(self, *args, **options):
+        subscriptions = Subscribe.objects.filter(
+            author__subscribers_count__lte=settings.FEED_FANOUT_LIMIT
+        ).select_related('user').order_by('pk')
+        processed = 0
+        for subscription in subscriptions.iterator():
+            backfill_feed(subscription.user, subscription.author_id)
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано подписок: {processed}.'
+        ))
@@ -0,0 +1,113 @@
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from api.benchmarks import percentile
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = (
+    '/api/tags/',
+    '/api/ingredients/?name=му',
+    '/api/recipes/',
+    '/api/recipes/?tags=seed-tag-0',
+    '/api/recipes/{recipe_id}/',
+    '/api/recipes/download_shopping_cart/',
+)
+# Без --token эти адреса пропускаются.
+AUTH_PATHS = ('/api/recipes/download_shopping_cart/',)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенный сервер параллельными запросами на чтение и '
+        'выводит пропускную способность и задержки для каждого уровня '
+        'параллелизма. Используется для сравнения WSGI и ASGI профилей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://127.0.0.1:8000',
+            help='Адрес сервера'
+        )
+        parser.add_argument(
+            '--path',
+            dest='paths',
+            action='append',
+            help='Адрес для запросов, можно указать несколько раз'
+        )
+        parser.add_argument(
+            '--concurrency',
+            default='1,4,16,64',
+            help='Уровни параллелизма через запятую'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=400,
+            help='Количество запросов на каждом уровне'
+        )
+        parser.add_argument('--token', help='Токен для авторизации')
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        base_url = options['url'].rstrip('/')
+        paths = options['paths'] or DEFAULT_PATHS
+        if not options['token']:
+            paths = [path for path in paths if path not in AUTH_PATHS]
+
+        def fetch(url):
+            started = time.perf_counter()
+            try:
+                with urlopen(Request(url, headers=headers)) as response:
+                    response.read()
+            except HTTPError as error:
+                raise CommandError(f'{url}: {error.code}')
+            return time.perf_counter() - started
+
+        recipe_id = None
+        if any('{recipe_id}' in path for path in paths):
+            with urlopen(Request(
+                    f'{base_url}/api/recipes/?limit=1',
+                    headers=headers
+            )) as response:
+                recipe_id = json.load(response)['results'][0]['id']
+        urls = [
+            base_url + quote(path.format(recipe_id=recipe_id), safe='/?=&')
+            for path in paths
+        ]
+        for url in urls:
+            self.stdout.write(url)
+            fetch(url)
+        results = {}
+        for concurrency in map(int, options['concurrency'].split(',')):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as executor:
+                timings = list(executor.map(
+                    fetch,
+                    islice(cycle(urls), options['requests'])
+                ))
+            elapsed = time.perf_counter() - started
+            results[concurrency] = {
+                'requests': len(timings),
+                'throughput_rps': round(len(timings) / elapsed, 1),
+                'p50_ms': round(statistics.median(timings) * 1000, 2),
+                'p95_ms': round(percentile(timings, 95) * 1000, 2),
+            }
+            self.stdout.write(
+                f'параллельно {concurrency:>4}: '
+                f'{results[concurrency]["throughput_rps"]:8.1f} rps, '
+                f'p50 {results[concurrency]["p50_ms"]:8.2f} мс, '
+                f'p95 {results[concurrency]["p95_ms"]:8.2f} мс'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2)
@@ -0,0 +1,101 @@
+import statistics
+import time
+from urllib.parse import unquote_plus
+
+from api.filters import RecipeFilter
+from api.models import Favorite, Recipe, Tag
+from api.seed import seed
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import QueryDict
+from django.test import RequestFactory
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет время и показывает план запроса для каждой комбинации '
+        'фильтров списка рецептов. При необходимости досоздает рецепты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=100000,
+            help='Минимальное количество рецептов в базе'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Количество повторов каждого запроса'
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=6,
+            help='Размер страницы'
+        )
+        parser.add_argument(
+            '--explain',
+            action='store_true',
+            help='Выводить план запроса страницы'
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Выполнять EXPLAIN ANALYZE (только PostgreSQL)'
+        )
+
+    def handle(self, *args, **options):
+        missing = options['recipes'] - Recipe.objects.count()
+        if missing > 0:
+            self.stdout.write(f'Создание {missing} рецептов...')
+            seed(users=max(100, missing // 100), recipes=missing)
+        favorite = Favorite.objects.select_related('owner', 'recipe').first()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        if favorite is None or len(tags) < 2:
+            raise CommandError('В базе недостаточно данных для бенчмарка.')
+        user = favorite.owner
+        author = [favorite.recipe.author_id]
+        combinations = (
+            {},
+            {'author': author},
+            {'tags': tags[:1]},
+            {'tags': tags},
+            {'is_favorited': [1]},
+            {'is_in_shopping_cart': [1]},
+            {'is_favorited': [1], 'tags': tags[:1]},
+            {'author': author, 'tags': tags},
+            {'search': ['борщ']},
+            {'search': ['домашний пирог']},
+            {'search': ['котлеты'], 'tags': tags[:1]},
+        )
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options['analyze'] = True
+        for params in combinations:
+            data = QueryDict(mutable=True)
+            for key, value in params.items():
+                data.setlist(key, value)
+            request = RequestFactory().get('/api/recipes/', data)
+            request.user = user
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                queryset = RecipeFilter(
+                    data=data,
+                    queryset=Recipe.objects.for_user(user),
+                    request=request
+                ).qs
+                page = queryset[:options['page_size']]
+                queryset.count()
+                list(page)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f'{unquote_plus(data.urlencode()) or "без фильтров":<60} '
+                f'медиана {statistics.median(timings):8.2f} мс, '
+                f'минимум {min(timings):8.2f} мс'
+            )
+            if options['explain']:
+                self.stdout.write(page.explain(**explain_options) + '\n')
@@ -0,0 +1,37 @@
+from api.images import save_image_variants
+from api.models import Recipe
+from django.core.management.base import BaseCommand
+from rest_framework.exceptions import ValidationError
+
+
+class Command(BaseCommand):
+    help = 'Создает превью и фото для карточек у рецептов, где их нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать варианты для всех рецептов'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_card='')
+        processed = failed = 0
+        for recipe in recipes.only('pk', 'image').iterator():
+            try:
+                save_image_variants(recipe)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {recipe.pk}: {error}')
+            except ValidationError as error:
+                failed += 1
+                self.stderr.write(
+                    f'Рецепт {recipe.pk}: {error.detail["image"]}'
+                )
+            else:
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {processed}, с ошибками: {failed}.'
+        ))
@@ -0,0 +1,75 @@
+import resource
+import time
+
+from api.models import RecipeSimilarity
+from api.recommendations import CHUNK_PAIRS, iter_similarities
+from api.utils import batched
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает таблицу похожих рецептов по совместному избранному, '
+        'спискам покупок и тегам. Выводит время работы и пик памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Сколько похожих рецептов хранить для каждого рецепта'
+        )
+        parser.add_argument(
+            '--tag-weight',
+            type=float,
+            default=0.2,
+            help='Доля сходства по тегам в итоговой оценке, от 0 до 1'
+        )
+        parser.add_argument(
+            '--min-common',
+            type=int,
+            default=1,
+            help='Минимум общих пользователей у пары рецептов'
+        )
+        parser.add_argument(
+            '--max-user-items',
+            type=int,
+            default=500,
+            help='Сколько последних рецептов пользователя учитывать'
+        )
+        parser.add_argument(
+            '--chunk-pairs',
+            type=int,
+            default=CHUNK_PAIRS,
+            help='Сколько пар рецептов считать за один блок A^T*A'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество строк в одной вставке'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        similarities = iter_similarities(
+            options['top'],
+            options['tag_weight'],
+            options['max_user_items'],
+            options['min_common'],
+            options['chunk_pairs']
+        )
+        created = 0
+        with transaction.atomic():
+            RecipeSimilarity.objects.all().delete()
+            for batch in batched(similarities, options['batch_size']):
+                RecipeSimilarity.objects.bulk_create(batch)
+                created += len(batch)
+        elapsed = time.monotonic() - started
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(self.style.SUCCESS(
+            f'Сохранено пар: {created} за {elapsed:.2f} с, '
+            f'пик памяти процесса {peak:.0f} МБ.'
+        ))
@@ -0,0 +1,122 @@
+import os
+import time
+
+from api.utils import batched
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import models
+
+
+def iter_files(root, older_than):
+    """Обходит каталог без построения полного списка файлов."""
+    directories = [root]
+    while directories:
+        with os.scandir(directories.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                elif (
+                    entry.is_file(follow_symlinks=False)
+                    and entry.stat().st_mtime < older_than
+                ):
+                    yield entry
+
+
+def remove_if_stale(path, older_than, dry_run):
+    """
+    Удаляет файл и возвращает его размер.
+
+    Время изменения проверяется еще раз: пока шла проверка ссылок, файл
+    мог снова понадобиться, и хранилище обновило его.
+    """
+    try:
+        stat = os.stat(path)
+        if stat.st_mtime >= older_than:
+            return None
+        if not dry_run:
+            os.remove(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size
+
+
+def get_file_fields():
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, models.FileField)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из MEDIA_ROOT файлы, на которые не ссылается ни одно '
+        'файловое поле моделей. Каталог обходится потоково, ссылки '
+        'проверяются пачками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет удалено'
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=3600,
+            help=(
+                'Не трогать файлы моложе указанного числа секунд, '
+                'чтобы не удалить фото еще не сохраненного рецепта'
+            )
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество файлов в одной проверке'
+        )
+
+    def handle(self, *args, **options):
+        root = settings.MEDIA_ROOT
+        if not os.path.isdir(root):
+            self.stdout.write('Каталог MEDIA_ROOT не существует.')
+            return
+        file_fields = get_file_fields()
+        older_than = time.time() - options['min_age']
+        scanned = deleted = freed = 0
+        for batch in batched(
+                iter_files(root, older_than),
+                options['batch_size']
+        ):
+            names = {
+                os.path.relpath(entry.path, root).replace(os.sep, '/'): entry
+                for entry in batch
+            }
+            referenced = set()
+            for model, field_name in file_fields:
+                referenced.update(
+                    model.objects.filter(
+                        **{f'{field_name}__in': names}
+                    ).values_list(field_name, flat=True)
+                )
+            scanned += len(names)
+            for name in names.keys() - referenced:
+                size = remove_if_stale(
+                    names[name].path,
+                    older_than,
+                    options['dry_run']
+                )
+                if size is None:
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(name)
+                deleted += 1
+                freed += size
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено файлов: {scanned}. {action}: {deleted} '
+            f'({freed / 1024 / 1024:.1f} МБ).'
+        ))
@@ -0,0 +1,124 @@
+import csv
+import json
+import os
+import time
+
+from api.mixins import bump_reference_version
+from api.models import Ingredient
+from django.core.management.base import BaseCommand, CommandError
+
+READ_CHUNK_SIZE = 64 * 1024
+CSV_HEADER = ['name', 'measurement_unit']
+
+
+def iter_csv(file):
+    reader = csv.reader(file)
+    for row in reader:
+        if not any(cell.strip() for cell in row) or row == CSV_HEADER:
+            continue
+        if len(row) < 2:
+            raise CommandError(
+                f'Строка {reader.line_num}: ожидается '
+                f'название и единица измерения через запятую.'
+            )
+        yield row[0], row[1]
+
+
+def iter_json(file):
+    """Читает массив объектов по одному, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('JSON-файл должен содержать массив ингредиентов.')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный JSON-файл.')
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        yield item['name'], item['measurement_unit']
+
+
+READERS = {
+    'csv': iter_csv,
+    'json': iter_json,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает ингредиенты из CSV или JSON пачками. Уже существующие '
+        'пары (name, measurement_unit) пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу с ингредиентами')
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла, по умолчанию определяется по расширению'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Количество строк в одной вставке'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = (
+            options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        )
+        if file_format not in READERS:
+            raise CommandError(
+                'Не удалось определить формат файла, укажите --format.'
+            )
+        batch_size = options['batch_size']
+        read = created = 0
+        started = time.monotonic()
+        with open(path, encoding='utf-8', newline='') as file:
+            batch = []
+            for name, measurement_unit in READERS[file_format](file):
+                batch.append((name.strip(), measurement_unit.strip()))
+                if len(batch) >= batch_size:
+                    read += len(batch)
+                    created += self.load_batch(batch)
+                    batch = []
+            read += len(batch)
+            created += self.load_batch(batch)
+        if created:
+            bump_reference_version('ingredients')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано {read}, добавлено {created}, '
+            f'пропущено {read - created} за {elapsed:.2f} с '
+            f'({read / elapsed if elapsed else read:.0f} строк/с).'
+        ))
+
+    def load_batch(self, batch):
+        rows = dict.fromkeys(batch)
+        if not rows:
+            return 0
+        existing = set(
+            Ingredient.objects.filter(
+                name__in={name for name, _ in rows}
+            ).values_list('name', 'measurement_unit')
+        )
+        new_ingredients = [
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in rows
+            if (name, measurement_unit) not in existing
+        ]
+        # Пары, добавленные параллельной загрузкой, пропускает
+        # ограничение уникальности, а не ошибка всей загрузки.
+        Ingredient.objects.bulk_create(new_ingredients, ignore_conflicts=True)
+        return len(new_ingredients)
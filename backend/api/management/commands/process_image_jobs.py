@@ -0,0 +1,67 @@
+import time
+
+from api.images import claim_image_jobs, process_image_job
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Обрабатывает очередь фото рецептов: декодирует base64, сохраняет '
+        'файл и его уменьшенные варианты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать текущую очередь и завершиться'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Количество заданий, забираемых за раз'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2,
+            help='Пауза между опросами пустой очереди, с'
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=300,
+            help='Через сколько секунд зависшее задание вернется в очередь'
+        )
+
+    def handle(self, *args, **options):
+        processed = failed = 0
+        while True:
+            jobs = claim_image_jobs(
+                options['batch_size'],
+                options['stale_after']
+            )
+            for job in jobs:
+                try:
+                    success = process_image_job(job)
+                except Exception as error:
+                    # Например, база недоступна: задание вернется в
+                    # очередь через --stale-after, остальные идут дальше.
+                    success = False
+                    job.error = str(error)
+                if success:
+                    processed += 1
+                else:
+                    failed += 1
+                    self.stderr.write(
+                        f'Рецепт {job.recipe_id}: {job.error}'
+                    )
+            if jobs:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано {processed}, с ошибкой {failed}.'
+        ))
@@ -0,0 +1,59 @@
+import time
+
+from api.indexes import recipe_search_index
+from api.models import POSTGRES, Recipe
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает поисковые векторы рецептов пачками (PostgreSQL) '
+        'или строит индекс в памяти, чтобы проверить время построения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Количество рецептов в одном UPDATE'
+        )
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Обновить только рецепты без поискового вектора'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if not POSTGRES:
+            recipe_search_index.invalidate()
+            postings, documents = recipe_search_index.get_data()
+            self.stdout.write(self.style.SUCCESS(
+                f'Индекс в памяти: рецептов {len(documents)}, '
+                f'основ слов {len(postings)} за '
+                f'{time.monotonic() - started:.2f} с.'
+            ))
+            return
+        recipes = Recipe.objects.order_by('pk')
+        if options['missing']:
+            recipes = recipes.filter(search_vector=None)
+        batch_size = options['batch_size']
+        updated = 0
+        last_id = 0
+        while True:
+            recipe_ids = list(recipes.filter(pk__gt=last_id).values_list(
+                'pk',
+                flat=True
+            )[:batch_size])
+            if not recipe_ids:
+                break
+            updated += Recipe.objects.filter(
+                pk__gte=recipe_ids[0],
+                pk__lte=recipe_ids[-1]
+            ).update_search_vectors()
+            last_id = recipe_ids[-1]
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {updated} за '
+            f'{time.monotonic() - started:.2f} с.'
+        ))
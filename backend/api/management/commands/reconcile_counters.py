@@ -0,0 +1,55 @@
+from api.models import Favorite, Recipe
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from users.models import Subscribe
+
+User = get_user_model()
+
+
+def count_related(queryset, field):
+    """Подзапрос с количеством строк queryset, связанных с внешней записью."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(count=Count('pk')).values('count'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def reconcile(queryset, counter, actual):
+    return queryset.exclude(**{counter: actual}).update(**{counter: actual})
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счетчики избранного, рецептов и подписчиков '
+        'и исправляет расхождения.'
+    )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        favorites = reconcile(
+            Recipe.objects.all(),
+            'favorites_count',
+            count_related(Favorite.objects.all(), 'recipe')
+        )
+        recipes = reconcile(
+            User.objects.all(),
+            'recipes_count',
+            count_related(Recipe.objects.all(), 'author')
+        )
+        subscribers = reconcile(
+            User.objects.all(),
+            'subscribers_count',
+            count_related(Subscribe.objects.all(), 'author')
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счетчиков: избранного {favorites}, '
+            f'рецептов {recipes}, подписчиков {subscribers}.'
+        ))
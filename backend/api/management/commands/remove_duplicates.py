@@ -0,0 +1,74 @@
+from api.models import Cart, Ingredient, RecipeIngredient
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+
+
+def find_duplicates(queryset, fields, **aggregates):
+    return queryset.values(*fields).annotate(
+        count=Count('id'),
+        keep_id=Min('id'),
+        **aggregates
+    ).filter(count__gt=1).order_by()
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет дубликаты ингредиентов, ингредиентов рецептов и покупок. '
+        'Запускается перед migrate, добавляющей уникальные ограничения.'
+    )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        ingredients = self.merge_ingredients()
+        recipe_ingredients = self.merge_recipe_ingredients()
+        carts = self.remove_cart_duplicates()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено дубликатов: ингредиентов {ingredients}, '
+            f'ингредиентов рецептов {recipe_ingredients}, '
+            f'покупок {carts}.'
+        ))
+
+    def merge_ingredients(self):
+        removed = 0
+        duplicates = find_duplicates(
+            Ingredient.objects.all(),
+            ('name', 'measurement_unit')
+        )
+        for duplicate in duplicates:
+            extra_ingredients = Ingredient.objects.filter(
+                name=duplicate['name'],
+                measurement_unit=duplicate['measurement_unit']
+            ).exclude(id=duplicate['keep_id'])
+            RecipeIngredient.objects.filter(
+                ingredient__in=extra_ingredients
+            ).update(ingredient_id=duplicate['keep_id'])
+            removed += extra_ingredients.delete()[0]
+        return removed
+
+    def merge_recipe_ingredients(self):
+        removed = 0
+        duplicates = find_duplicates(
+            RecipeIngredient.objects.all(),
+            ('recipe', 'ingredient'),
+            total_amount=Sum('amount')
+        )
+        for duplicate in duplicates:
+            RecipeIngredient.objects.filter(
+                id=duplicate['keep_id']
+            ).update(amount=duplicate['total_amount'])
+            removed += RecipeIngredient.objects.filter(
+                recipe=duplicate['recipe'],
+                ingredient=duplicate['ingredient']
+            ).exclude(id=duplicate['keep_id']).delete()[0]
+        return removed
+
+    def remove_cart_duplicates(self):
+        removed = 0
+        duplicates = find_duplicates(Cart.objects.all(), ('owner', 'recipe'))
+        for duplicate in duplicates:
+            removed += Cart.objects.filter(
+                owner=duplicate['owner'],
+                recipe=duplicate['recipe']
+            ).exclude(id=duplicate['keep_id']).delete()[0]
+        return removed
@@ -0,0 +1,56 @@
+import json
+
+from api.benchmarks import run_benchmarks
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет сценарии API на текущей базе и выводит p50/p95, '
+        'число SQL-запросов и пропускную способность. Результат можно '
+        'сохранить в JSON и сравнить с прошлым прогоном.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Количество замеряемых запросов в сценарии'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=2,
+            help='Количество прогревочных запросов'
+        )
+        parser.add_argument(
+            '-k',
+            dest='names',
+            action='append',
+            help='Запускать только сценарии, содержащие подстроку'
+        )
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+        parser.add_argument(
+            '--compare',
+            help='JSON прошлого прогона для сравнения'
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)['scenarios']
+        report = run_benchmarks(
+            repeat=options['repeat'],
+            warmup=options['warmup'],
+            names=options['names'],
+            stdout=self.stdout,
+            baseline=baseline
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Результаты сохранены в {options["output"]}.'
+            ))
@@ -0,0 +1,99 @@
+import hashlib
+import time
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def get_version_key(prefix):
+    return f'reference_version:{prefix}'
+
+
+def bump_reference_version(prefix):
+    """Объявляет закэшированные ответы справочника устаревшими."""
+    version = (uuid.uuid4().hex, int(time.time()))
+    cache.set(get_version_key(prefix), version, None)
+    return version
+
+
+def get_reference_version(prefix):
+    version = cache.get(get_version_key(prefix))
+    if version is None:
+        version = bump_reference_version(prefix)
+    return version
+
+
+class CachedReferenceMixin:
+    """
+    Кэширует ответы на чтение справочника и поддерживает ETag/Last-Modified.
+
+    Ключи кэша содержат версию справочника, которую сигналы меняют при
+    каждой записи в модель, поэтому старые ответы просто перестают
+    запрашиваться.
+    """
+
+    cache_prefix = None
+    # Параметры запроса, от которых зависит ответ; остальные не попадают
+    # в ключ кэша, чтобы произвольные строки запроса не плодили ключи.
+    cache_query_params = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return '*' in etags or etag in etags
+        if_modified_since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', '')
+        )
+        return (
+            if_modified_since is not None
+            and last_modified <= if_modified_since
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        version, last_modified = get_reference_version(self.cache_prefix)
+        etag = f'"{self.cache_prefix}-{version}"'
+        if self.is_not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            params = urlencode([
+                (name, request.query_params[name])
+                for name in self.cache_query_params
+                if name in request.query_params
+            ])
+            # Длина ключа memcached ограничена, параметры поиска - нет.
+            digest = hashlib.md5(f'{request.path}?{params}'.encode())
+            key = (
+                f'reference:{self.cache_prefix}:{version}:'
+                f'{digest.hexdigest()}'
+            )
+            data = cache.get(key)
+            if data is None:
+                response = handler(request, *args, **kwargs)
+                if response.status_code == status.HTTP_200_OK:
+                    cache.set(
+                        key,
+                        response.data,
+                        settings.REFERENCE_CACHE_TIMEOUT
+                    )
+            else:
+                response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'no-cache'
+        return response
@@ -1,10 +1,19 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Exists, OuterRef, Prefetch
 from django.db.models.constraints import UniqueConstraint
 
+from .storage import content_hash_storage
+
 User = get_user_model()
 
+POSTGRES = 'postgresql' in (settings.DATABASES['default'].get('ENGINE') or '')
+SEARCH_CONFIG = 'russian'
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -23,6 +32,10 @@ class Ingredient(models.Model):
     )
 
     class Meta:
+        constraints = (UniqueConstraint(
+            fields=('name', 'measurement_unit'),
+            name='unique_ingredient'
+        ),)
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
 
@@ -65,7 +78,66 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        """Подгружает теги и ингредиенты рецептов без N+1 запросов."""
+        return self.prefetch_related(
+            'tags',
+            Prefetch(
+                'recipeingredient_set',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            )
+        )
+
+    def for_user(self, user):
+        """Рецепты со всеми связанными данными для выдачи пользователю."""
+        queryset = self.with_related()
+        if user.is_anonymous:
+            return queryset.select_related('author')
+        return queryset.with_user_flags(user)
+
+    def with_user_flags(self, user):
+        """Добавляет флаги избранного, списка покупок и подписки на автора."""
+        if user.is_anonymous:
+            return self
+        return self.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(owner=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                Cart.objects.filter(owner=user, recipe=OuterRef('pk'))
+            )
+        ).prefetch_related(
+            Prefetch(
+                'author',
+                queryset=User.objects.with_is_subscribed(user)
+            )
+        )
+
+    def update_search_vectors(self):
+        """Пересчитывает поисковый вектор рецептов (только PostgreSQL)."""
+        if not POSTGRES:
+            return 0
+        return self.update(
+            search_vector=(
+                SearchVector('name', weight='A', config=SEARCH_CONFIG)
+                + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+            )
+        )
+
+
 class Recipe(models.Model):
+    IMAGE_READY = 'ready'
+    IMAGE_PENDING = 'pending'
+    IMAGE_FAILED = 'failed'
+
+    IMAGE_STATUS = (
+        (IMAGE_READY, IMAGE_READY),
+        (IMAGE_PENDING, IMAGE_PENDING),
+        (IMAGE_FAILED, IMAGE_FAILED)
+    )
+
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -87,11 +159,33 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='recipes/',
+        storage=content_hash_storage,
         blank=False,
         verbose_name='Фото готового блюда',
         help_text=('Прикрепите фото блюда приготовленного '
                    'по приведенному рецепту')
     )
+    image_preview = models.ImageField(
+        upload_to='recipes/previews/',
+        storage=content_hash_storage,
+        blank=True,
+        editable=False,
+        verbose_name='Превью фото блюда'
+    )
+    image_card = models.ImageField(
+        upload_to='recipes/cards/',
+        storage=content_hash_storage,
+        blank=True,
+        editable=False,
+        verbose_name='Фото блюда для карточки'
+    )
+    image_status = models.CharField(
+        max_length=10,
+        choices=IMAGE_STATUS,
+        default=IMAGE_READY,
+        editable=False,
+        verbose_name='Состояние обработки фото'
+    )
     cooking_time = models.PositiveSmallIntegerField(
         validators=(
             MinValueValidator(
@@ -125,9 +219,24 @@ class Recipe(models.Model):
         db_index=True,
         verbose_name='Дата публикации рецепта'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в избранное'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            GinIndex(fields=('search_vector',), name='recipe_search_vector'),
+        ) if POSTGRES else ()
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -161,6 +270,10 @@ class RecipeIngredient(models.Model):
     )
 
     class Meta:
+        constraints = (UniqueConstraint(
+            fields=('recipe', 'ingredient'),
+            name='unique_recipe_ingredient'
+        ),)
         verbose_name = 'Ингредиент рецепта'
         verbose_name_plural = 'Ингредиенты рецепта'
 
@@ -214,8 +327,110 @@ class Cart(models.Model):
     )
 
     class Meta:
+        constraints = (UniqueConstraint(
+            fields=('owner', 'recipe'),
+            name='unique_cart'
+        ),)
         verbose_name = 'Покупка'
         verbose_name_plural = 'Список покупок'
 
     def __str__(self):
         return f'{self.owner.username} -> {self.recipe.name}'
+
+
+class RecipeImageJob(models.Model):
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    FAILED = 'failed'
+
+    STATUS = (
+        (PENDING, PENDING),
+        (PROCESSING, PROCESSING),
+        (FAILED, FAILED)
+    )
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_job',
+        verbose_name='Рецепт'
+    )
+    payload = models.TextField(verbose_name='Фото в base64')
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS,
+        default=PENDING,
+        db_index=True,
+        verbose_name='Состояние'
+    )
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+
+    class Meta:
+        ordering = ('created',)
+        verbose_name = 'Обработка фото рецепта'
+        verbose_name_plural = 'Обработка фото рецептов'
+
+    def __str__(self):
+        return f'{self.recipe.name} -> {self.status}'
+
+
+class RecipeSimilarity(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similarities',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Степень сходства')
+
+    class Meta:
+        constraints = (UniqueConstraint(
+            fields=('recipe', 'similar'),
+            name='unique_recipe_similarity'
+        ),)
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+
+
+class FeedItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации рецепта')
+
+    class Meta:
+        constraints = (UniqueConstraint(
+            fields=('user', 'recipe'),
+            name='unique_feed_item'
+        ),)
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-id'),
+                name='feed_item_user_pub_date'
+            ),
+        )
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Лента подписок'
@@ -0,0 +1,51 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class LimitFieldPagination(PageNumberPagination):
+    page_size_query_param = 'limit'
+
+
+class LimitFieldCursorPagination(CursorPagination):
+    """Курсорная пагинация по (pub_date, id) без COUNT и OFFSET."""
+
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+
+
+class SubscriptionCursorPagination(LimitFieldCursorPagination):
+    ordering = ('-subscription_id',)
+
+
+class OptionalCursorPaginationMixin:
+    """
+    Включает курсорную пагинацию параметром запроса pagination=cursor.
+
+    Курсор задает свой порядок, поэтому параметры из
+    cursor_incompatible_params, которые сами упорядочивают выдачу
+    (например, search по релевантности), вместе с ним дают 400.
+    """
+
+    cursor_pagination_class = LimitFieldCursorPagination
+    cursor_incompatible_params = ()
+
+    @property
+    def paginator(self):
+        if (
+            not hasattr(self, '_paginator')
+            and self.request.query_params.get('pagination') == 'cursor'
+        ):
+            params = [
+                name
+                for name in self.cursor_incompatible_params
+                if self.request.query_params.get(name)
+            ]
+            if params:
+                raise ValidationError({
+                    'pagination': (
+                        'Курсорная пагинация несовместима с параметрами: '
+                        + ', '.join(params)
+                    )
+                })
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
@@ -0,0 +1,222 @@
+import heapq
+from array import array
+
+import numpy as np
+from django.db.models import Sum
+from scipy import sparse
+from users.models import Subscribe
+
+from .models import Cart, Favorite, Recipe, RecipeSimilarity
+
+SEED_RECIPES_LIMIT = 50
+CANDIDATES_LIMIT = 200
+RECOMMENDATIONS_LIMIT = 100
+SUBSCRIPTION_BOOST = 0.5
+CHUNK_PAIRS = 2000000
+SCORE_TOLERANCE = 1e-9
+BIT_COUNTS = np.array([bin(byte).count('1') for byte in range(256)])
+
+
+def load_interactions(max_user_items):
+    """
+    Разреженная матрица пользователь-рецепт из избранного и покупок.
+
+    У каждого пользователя учитываются только max_user_items последних
+    рецептов, иначе несколько очень активных пользователей дают
+    квадратичное число пар. Столбцы - рецепты с взаимодействиями,
+    их id возвращаются вторым значением.
+    """
+    user_rows = {}
+    rows = array('I')
+    recipe_ids = array('I')
+    for model in (Favorite, Cart):
+        pairs = model.objects.order_by('-pk').values_list(
+            'owner_id',
+            'recipe_id'
+        )
+        for user_id, recipe_id in pairs.iterator(chunk_size=10000):
+            row = user_rows.setdefault(user_id, [len(user_rows), 0])
+            if row[1] < max_user_items:
+                row[1] += 1
+                rows.append(row[0])
+                recipe_ids.append(recipe_id)
+    columns, column_ids = np.unique(recipe_ids, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, column_ids)),
+        shape=(len(user_rows), len(columns))
+    )
+    # Рецепт и в избранном, и в покупках - одно взаимодействие.
+    matrix.data[:] = 1
+    return matrix, columns
+
+
+def load_tags(recipe_ids):
+    """
+    Теги рецептов в порядке recipe_ids: строка - упакованные биты
+    (np.packbits) по одному на тег.
+    """
+    pairs = np.array(
+        Recipe.tags.through.objects.values_list('recipe_id', 'tag_id'),
+        dtype=np.int64
+    ).reshape(-1, 2)
+    pairs = pairs[np.isin(pairs[:, 0], recipe_ids)]
+    _, tag_columns = np.unique(pairs[:, 1], return_inverse=True)
+    tags = np.zeros(
+        (len(recipe_ids), tag_columns.max(initial=-1) + 1),
+        dtype=bool
+    )
+    tags[np.searchsorted(recipe_ids, pairs[:, 0]), tag_columns] = True
+    return np.packbits(tags, axis=1)
+
+
+def count_bits(packed):
+    return BIT_COUNTS[packed].sum(axis=1, dtype=np.int64)
+
+
+def get_ranks(rows):
+    """Номер каждого элемента внутри строки для упорядоченных rows."""
+    counts = np.bincount(rows)
+    starts = np.cumsum(counts) - counts
+    return np.arange(len(rows)) - starts[rows]
+
+
+def select_top(rows, columns, scores, top):
+    """
+    Оставляет в каждой строке top пар с наибольшей оценкой, при
+    равенстве - с большим номером столбца (как heapq.nlargest).
+
+    Точная сортировка по трем ключам медленная, поэтому сначала порог
+    каждой строки находится сортировкой по одному ключу, а точно
+    сортируются только пары не ниже порога.
+    """
+    order = np.argsort(rows * 2.0 - scores)
+    at_top = order[get_ranks(rows[order]) == top - 1]
+    thresholds = np.full(rows.max(initial=0) + 1, -np.inf)
+    thresholds[rows[at_top]] = scores[at_top]
+    keep = scores >= thresholds[rows] - SCORE_TOLERANCE
+    rows, columns, scores = rows[keep], columns[keep], scores[keep]
+    order = np.lexsort((-columns, -scores, rows))
+    rows, columns, scores = rows[order], columns[order], scores[order]
+    keep = get_ranks(rows) < top
+    return rows[keep], columns[keep], scores[keep]
+
+
+def iter_chunks(recipe_users, interactions, chunk_pairs):
+    """
+    Границы блоков рецептов, в каждом не больше chunk_pairs пар с
+    общими пользователями (по оценке сверху), но хотя бы один рецепт.
+    """
+    pairs = np.cumsum(recipe_users @ np.diff(interactions.indptr))
+    start = 0
+    while start < len(pairs):
+        done = pairs[start - 1] if start else 0
+        end = max(
+            np.searchsorted(pairs, done + chunk_pairs, side='right'),
+            start + 1
+        )
+        yield start, end
+        start = end
+
+
+def get_similarities(interactions, tags, top, tag_weight, min_common=1,
+                     chunk_pairs=CHUNK_PAIRS):
+    """
+    Для каждого столбца interactions отдает top самых похожих столбцов.
+
+    Сходство - косинус между столбцами бинарной матрицы взаимодействий,
+    смешанный с долей общих тегов (строки tags из load_tags). A^T*A
+    считается блоками строк примерно по chunk_pairs пар, поэтому в
+    памяти одновременно держится только блок пересечений. Отдает тройки
+    массивов: номера рецептов, номера похожих рецептов и оценки.
+    """
+    recipe_users = interactions.T.tocsr()
+    user_counts = np.diff(recipe_users.indptr).astype(np.float64)
+    tag_counts = count_bits(tags)
+    for start, end in iter_chunks(recipe_users, interactions, chunk_pairs):
+        common = (recipe_users[start:end] @ interactions).tocoo()
+        keep = (common.row + start != common.col) & (
+            common.data >= min_common
+        )
+        rows, columns = common.row[keep], common.col[keep]
+        recipes = rows + start
+        scores = common.data[keep] / np.sqrt(
+            user_counts[recipes] * user_counts[columns]
+        )
+        if tag_weight:
+            shared = count_bits(tags[recipes] & tags[columns])
+            union = tag_counts[recipes] + tag_counts[columns] - shared
+            has_tags = union > 0
+            scores[has_tags] = (
+                (1 - tag_weight) * scores[has_tags]
+                + tag_weight * shared[has_tags] / union[has_tags]
+            )
+        rows, columns, scores = select_top(rows, columns, scores, top)
+        yield rows + start, columns, scores
+
+
+def iter_similarities(top, tag_weight, max_user_items, min_common=1,
+                      chunk_pairs=CHUNK_PAIRS):
+    """Для каждого рецепта отдает top самых похожих рецептов."""
+    interactions, recipe_ids = load_interactions(max_user_items)
+    tags = load_tags(recipe_ids)
+    for rows, columns, scores in get_similarities(
+            interactions, tags, top, tag_weight, min_common, chunk_pairs
+    ):
+        for recipe_id, similar_id, score in zip(
+                recipe_ids[rows].tolist(),
+                recipe_ids[columns].tolist(),
+                scores.tolist()
+        ):
+            yield RecipeSimilarity(
+                recipe_id=recipe_id,
+                similar_id=similar_id,
+                score=score
+            )
+
+
+def get_recommended_ids(user, limit=RECOMMENDATIONS_LIMIT):
+    """
+    Id рецептов, похожих на избранное и покупки пользователя.
+
+    Рецепты авторов, на которых он подписан, поднимаются выше. Если
+    рекомендаций нет, отдаются самые популярные рецепты.
+    """
+    seed_ids = set()
+    if user.is_authenticated:
+        for model in (Favorite, Cart):
+            seed_ids.update(
+                model.objects.filter(owner=user).order_by(
+                    '-pk'
+                ).values_list('recipe_id', flat=True)[:SEED_RECIPES_LIMIT]
+            )
+    candidates = {}
+    if seed_ids:
+        candidates = dict(
+            RecipeSimilarity.objects.filter(
+                recipe__in=seed_ids
+            ).exclude(
+                similar__in=seed_ids
+            ).exclude(
+                similar__author=user
+            ).values('similar').annotate(
+                total=Sum('score')
+            ).order_by('-total').values_list(
+                'similar',
+                'total'
+            )[:CANDIDATES_LIMIT]
+        )
+    if not candidates:
+        popular = Recipe.objects.order_by('-favorites_count', '-pub_date')
+        if user.is_authenticated:
+            popular = popular.exclude(author=user)
+        return list(popular.values_list('pk', flat=True)[:limit])
+    authors = set(
+        Subscribe.objects.filter(user=user).values_list('author_id', flat=True)
+    )
+    if authors:
+        for recipe_id in Recipe.objects.filter(
+                pk__in=candidates,
+                author__in=authors
+        ).values_list('pk', flat=True):
+            candidates[recipe_id] *= 1 + SUBSCRIPTION_BOOST
+    return heapq.nlargest(limit, candidates, key=candidates.get)
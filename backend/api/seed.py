@@ -0,0 +1,177 @@
+import io
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from users.models import Subscribe
+
+from .indexes import recipe_ingredient_index, recipe_search_index
+from .models import Cart, Favorite, Ingredient, Recipe, RecipeIngredient, Tag
+from .utils import batched
+
+User = get_user_model()
+
+SEED_PREFIX = 'seed'
+WORDS = (
+    'борщ', 'суп', 'салат', 'пирог', 'блины', 'каша', 'котлеты', 'плов',
+    'запеканка', 'омлет', 'курица', 'говядина', 'рыба', 'грибы', 'картофель',
+    'томаты', 'сыр', 'молоко', 'яблоки', 'тыква', 'быстрый', 'домашний',
+    'пряный', 'сладкий', 'острый', 'легкий', 'праздничный', 'постный',
+)
+
+
+def bulk_insert(model, objects, batch_size):
+    for batch in batched(objects, batch_size):
+        model.objects.bulk_create(batch)
+
+
+def new_ids(model, last_id):
+    return list(
+        model.objects.filter(pk__gt=last_id).order_by('pk').values_list(
+            'pk',
+            flat=True
+        )
+    )
+
+
+def get_last_id(model):
+    return model.objects.order_by('-pk').values_list(
+        'pk',
+        flat=True
+    ).first() or 0
+
+
+def seed_tags(count):
+    for number in range(Tag.objects.count(), count):
+        Tag.objects.create(
+            name=f'{SEED_PREFIX} тег {number}',
+            color=f'#{number:06x}',
+            slug=f'{SEED_PREFIX}-tag-{number}'
+        )
+    return list(Tag.objects.values_list('pk', flat=True)[:count])
+
+
+def seed_ingredients(count):
+    existing = Ingredient.objects.count()
+    if existing < count:
+        Ingredient.objects.bulk_create(
+            Ingredient(
+                name=f'{SEED_PREFIX} ингредиент {number}',
+                measurement_unit='г'
+            )
+            for number in range(existing, count)
+        )
+    return list(Ingredient.objects.values_list('pk', flat=True)[:count])
+
+
+def seed_users(count, batch_size):
+    last_id = get_last_id(User)
+    start = User.objects.filter(
+        username__startswith=f'{SEED_PREFIX}_user_'
+    ).count()
+    password = make_password(None)
+    bulk_insert(User, (
+        User(
+            username=f'{SEED_PREFIX}_user_{number}',
+            email=f'{SEED_PREFIX}_user_{number}@example.com',
+            first_name='Имя',
+            last_name='Фамилия',
+            password=password
+        )
+        for number in range(start, start + count)
+    ), batch_size)
+    return new_ids(User, last_id)
+
+
+def seed_recipes(rng, author_ids, count, batch_size):
+    last_id = get_last_id(Recipe)
+    bulk_insert(Recipe, (
+        Recipe(
+            author_id=rng.choice(author_ids),
+            name=' '.join(rng.sample(WORDS, 2)).capitalize(),
+            text=' '.join(rng.choices(WORDS, k=30)),
+            image=f'recipes/{SEED_PREFIX}.png',
+            cooking_time=rng.randint(1, 180)
+        )
+        for _ in range(count)
+    ), batch_size)
+    return new_ids(Recipe, last_id)
+
+
+def seed_relations(rng, recipe_ids, tag_ids, ingredient_ids,
+                   ingredients_per_recipe, batch_size):
+    tag_through = Recipe.tags.through
+    bulk_insert(tag_through, (
+        tag_through(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in rng.sample(tag_ids, rng.randint(1, len(tag_ids)))
+    ), batch_size)
+    bulk_insert(RecipeIngredient, (
+        RecipeIngredient(
+            recipe_id=recipe_id,
+            ingredient_id=ingredient_id,
+            amount=rng.randint(1, 500)
+        )
+        for recipe_id in recipe_ids
+        for ingredient_id in rng.sample(
+            ingredient_ids,
+            min(ingredients_per_recipe, len(ingredient_ids))
+        )
+    ), batch_size)
+
+
+def seed_user_lists(rng, model, user_ids, recipe_ids, per_user, batch_size):
+    bulk_insert(model, (
+        model(owner_id=user_id, recipe_id=recipe_id)
+        for user_id in user_ids
+        for recipe_id in rng.sample(
+            recipe_ids,
+            min(per_user, len(recipe_ids))
+        )
+    ), batch_size)
+
+
+def seed_subscriptions(rng, user_ids, per_user, batch_size):
+    bulk_insert(Subscribe, (
+        Subscribe(user_id=user_id, author_id=author_id)
+        for user_id in user_ids
+        for author_id in rng.sample(user_ids, min(per_user + 1, len(user_ids)))
+        if author_id != user_id
+    ), batch_size)
+
+
+def seed(users=100, recipes=1000, ingredients=200, tags=3,
+         ingredients_per_recipe=5, favorites_per_user=10, carts_per_user=5,
+         subscriptions_per_user=5, random_seed=0, batch_size=5000):
+    """
+    Наполняет базу детерминированными данными для бенчмарков.
+
+    Все объекты создаются через bulk_create пачками по batch_size,
+    повторный запуск добавляет новые объекты к уже созданным.
+    """
+    rng = random.Random(random_seed)
+    tag_ids = seed_tags(tags)
+    ingredient_ids = seed_ingredients(ingredients)
+    user_ids = seed_users(users, batch_size)
+    recipe_ids = seed_recipes(rng, user_ids, recipes, batch_size)
+    seed_relations(
+        rng,
+        recipe_ids,
+        tag_ids,
+        ingredient_ids,
+        ingredients_per_recipe,
+        batch_size
+    )
+    seed_user_lists(
+        rng, Favorite, user_ids, recipe_ids, favorites_per_user, batch_size
+    )
+    seed_user_lists(
+        rng, Cart, user_ids, recipe_ids, carts_per_user, batch_size
+    )
+    seed_subscriptions(rng, user_ids, subscriptions_per_user, batch_size)
+    call_command('reconcile_counters', stdout=io.StringIO())
+    Recipe.objects.filter(search_vector=None).update_search_vectors()
+    recipe_search_index.invalidate()
+    recipe_ingredient_index.reset()
+    return user_ids, recipe_ids
@@ -1,11 +1,21 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import F
-from django.shortcuts import get_object_or_404
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 from users.serializers import CustomUserSerializer
 
+from .feed import fan_out_recipe
+from .images import save_recipe_image
+from .indexes import recipe_ingredient_index
 from .models import Cart, Favorite, Ingredient, Recipe, RecipeIngredient, Tag
+from .shopping_cart import invalidate_recipe_shopping_lists
+
+User = get_user_model()
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -52,6 +62,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         source='recipeingredient_set',
         many=True
     )
+    image = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -64,11 +75,14 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_status',
             'text',
             'cooking_time'
         )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         cur_user = self.context['request'].user
         if cur_user.is_anonymous:
             return False
@@ -78,6 +92,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         cur_user = self.context['request'].user
         if cur_user.is_anonymous:
             return False
@@ -86,6 +102,14 @@ class RecipeSerializer(serializers.ModelSerializer):
             recipe=obj
         ).exists()
 
+    def get_image(self, obj):
+        image = obj.image
+        if self.context.get('image_variant') == 'card' and obj.image_card:
+            image = obj.image_card
+        if not image:
+            return None
+        return self.context['request'].build_absolute_uri(image.url)
+
 
 class PreviewRecipeSerializer(serializers.ModelSerializer):
     """Сериалайзер предпросмотра рецепта."""
@@ -98,15 +122,14 @@ class PreviewRecipeSerializer(serializers.ModelSerializer):
 
     def get_image(self, obj):
         request = self.context.get('request')
-        image_url = obj.image.url
-        return request.build_absolute_uri(image_url)
+        image = obj.image_preview or obj.image
+        if not image:
+            return None
+        return request.build_absolute_uri(image.url)
 
 
 class AddIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        source='ingredient',
-        queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -142,6 +165,7 @@ class AddRecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_status',
             'text',
             'cooking_time'
         )
@@ -159,32 +183,39 @@ class AddRecipeSerializer(serializers.ModelSerializer):
         return Cart.objects.filter(owner=cur_user, recipe=obj).exists()
 
     def create_ingredients(self, recipe, ingredients):
+        amounts = defaultdict(int)
         for ingredient in ingredients:
-            ingr_obj = get_object_or_404(
-                Ingredient,
-                id=ingredient['ingredient'].id
-            )
-            amount = ingredient['amount']
-            if RecipeIngredient.objects.filter(
-                    recipe=recipe,
-                    ingredient=ingr_obj
-            ).exists():
-                amount += F('amount')
-            RecipeIngredient.objects.update_or_create(
-                defaults={'amount': amount},
+            amounts[ingredient['id']] += ingredient['amount']
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
                 recipe=recipe,
-                ingredient=ingr_obj,
+                ingredient_id=ingredient_id,
+                amount=amount
             )
+            for ingredient_id, amount in amounts.items()
+        )
+        # bulk_create не отправляет сигналы, индекс обновляется явно.
+        transaction.on_commit(
+            lambda: recipe_ingredient_index.record_change(recipe.pk)
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
+        image = validated_data.pop('image')
         author = self.context.get('request').user
         recipe = Recipe.objects.create(author=author, **validated_data)
+        User.objects.filter(pk=author.pk).update(
+            recipes_count=F('recipes_count') + 1
+        )
         recipe.tags.set(tags)
         self.create_ingredients(recipe, ingredients)
+        save_recipe_image(recipe, image)
+        fan_out_recipe(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         if 'tags' in self.initial_data:
             tags = validated_data.pop('tags')
@@ -193,6 +224,7 @@ class AddRecipeSerializer(serializers.ModelSerializer):
             ingredients = validated_data.pop('ingredients')
             instance.ingredients.clear()
             self.create_ingredients(instance, ingredients)
+            invalidate_recipe_shopping_lists(instance)
         instance.name = validated_data.get(
             'name',
             instance.name
@@ -205,10 +237,33 @@ class AddRecipeSerializer(serializers.ModelSerializer):
             'cooking_time',
             instance.cooking_time
         )
-        instance.image = validated_data.get('image', instance.image)
         instance.save()
+        if 'image' in validated_data:
+            save_recipe_image(instance, validated_data['image'])
         return instance
 
+    def get_fields(self):
+        fields = super().get_fields()
+        if settings.RECIPE_IMAGE_BACKGROUND:
+            # Фото декодирует воркер process_image_jobs.
+            fields['image'] = serializers.CharField()
+        return fields
+
+    def validate_ingredients(self, ingredients):
+        ingredient_ids = {ingredient['id'] for ingredient in ingredients}
+        existing_ids = set(
+            Ingredient.objects.filter(
+                id__in=ingredient_ids
+            ).values_list('id', flat=True)
+        )
+        missing_ids = ingredient_ids - existing_ids
+        if missing_ids:
+            raise serializers.ValidationError(
+                'Ингредиенты не найдены: '
+                + ', '.join(map(str, sorted(missing_ids)))
+            )
+        return ingredients
+
     def validate(self, data):
         ingredients = self.initial_data.get('ingredients')
         cooking_time = self.initial_data.get('cooking_time')
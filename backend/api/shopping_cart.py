@@ -0,0 +1,184 @@
+import csv
+import json
+import os
+import tempfile
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from .models import Cart, RecipeIngredient
+
+CURSOR_CHUNK_SIZE = 500
+
+PDF_FONT = 'DejaVuSans'
+PDF_FONT_PATH = os.path.join(
+    os.path.dirname(__file__), 'fonts', 'DejaVuSans.ttf'
+)
+PDF_FONT_SIZE = 11
+PDF_TITLE_SIZE = 16
+PDF_LINE_HEIGHT = 16
+PDF_MARGIN = 50
+PDF_MEMORY_LIMIT = 1024 * 1024
+PDF_CHUNK_SIZE = 64 * 1024
+
+
+class Echo:
+    """Буфер для csv.writer, который сразу возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def get_generation_key(user_id):
+    return f'shopping_list_generation:{user_id}'
+
+
+def get_generation(user_id):
+    """Текущее поколение списка покупок, меняется при каждом изменении."""
+    key = get_generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def get_cache_key(user_id, generation):
+    return f'shopping_list:{user_id}:{generation}'
+
+
+def invalidate_shopping_lists(user_ids):
+    """
+    Меняет поколение списков покупок после фиксации транзакции.
+
+    Выгрузка, начатая до изменения, допишет кэш под старым поколением,
+    которое уже никто не прочитает.
+    """
+    keys = [get_generation_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(
+            {key: uuid.uuid4().hex for key in keys},
+            None
+        ))
+
+
+def invalidate_recipe_shopping_lists(recipe):
+    """Сбрасывает кэш у всех, кто добавил рецепт в список покупок."""
+    invalidate_shopping_lists(
+        Cart.objects.filter(recipe=recipe).values_list('owner_id', flat=True)
+    )
+
+
+def cache_rows(key, rows):
+    cached_rows = []
+    for row in rows:
+        cached_rows.append(row)
+        yield row
+    cache.set(key, cached_rows, settings.SHOPPING_LIST_CACHE_TIMEOUT)
+
+
+def get_shopping_list(user):
+    """
+    Ингредиенты из списка покупок пользователя, упорядоченные по имени.
+
+    Повторные выгрузки отдаются из кэша без обращения к базе.
+    """
+    key = get_cache_key(user.id, get_generation(user.id))
+    rows = cache.get(key)
+    if rows is not None:
+        return iter(rows)
+    return cache_rows(key, query_shopping_list(user))
+
+
+def query_shopping_list(user):
+    return RecipeIngredient.objects.filter(
+        recipe__shop_recipes__owner=user
+    ).values_list(
+        'ingredient__name',
+        'ingredient__measurement_unit'
+    ).annotate(
+        amount=Sum('amount')
+    ).order_by(
+        'ingredient__name',
+        'ingredient__measurement_unit'
+    ).iterator(chunk_size=CURSOR_CHUNK_SIZE)
+
+
+def render_txt(rows):
+    yield 'Foodgram\n\n'
+    for name, measurement_unit, amount in rows:
+        yield f' {name} - {amount} {measurement_unit}\n'
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Единица измерения', 'Количество'))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def render_json(rows):
+    yield '['
+    separator = ''
+    for name, measurement_unit, amount in rows:
+        yield separator + json.dumps({
+            'name': name,
+            'measurement_unit': measurement_unit,
+            'amount': amount
+        }, ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+def register_pdf_font():
+    if PDF_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(PDF_FONT, PDF_FONT_PATH))
+
+
+def render_pdf(rows):
+    """
+    Страницы PDF заполняются по мере чтения строк из курсора.
+
+    Таблица ссылок PDF пишется в конец файла, поэтому документ отдается
+    после сборки; больше PDF_MEMORY_LIMIT он держится во временном
+    файле, а не в памяти воркера.
+    """
+    register_pdf_font()
+    _, height = A4
+    with tempfile.SpooledTemporaryFile(PDF_MEMORY_LIMIT) as file:
+        pdf = canvas.Canvas(file, pagesize=A4)
+        pdf.setTitle('Foodgram')
+        pdf.setFont(PDF_FONT, PDF_TITLE_SIZE)
+        pdf.drawString(PDF_MARGIN, height - PDF_MARGIN, 'Foodgram')
+        pdf.setFont(PDF_FONT, PDF_FONT_SIZE)
+        y = height - PDF_MARGIN - 2 * PDF_LINE_HEIGHT
+        for name, measurement_unit, amount in rows:
+            if y < PDF_MARGIN:
+                pdf.showPage()
+                pdf.setFont(PDF_FONT, PDF_FONT_SIZE)
+                y = height - PDF_MARGIN
+            pdf.drawString(
+                PDF_MARGIN,
+                y,
+                f'{name} - {amount} {measurement_unit}'
+            )
+            y -= PDF_LINE_HEIGHT
+        pdf.save()
+        file.seek(0)
+        yield from iter(partial(file.read, PDF_CHUNK_SIZE), b'')
+
+
+EXPORT_FORMATS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'json': (render_json, 'application/json; charset=utf-8'),
+    'pdf': (render_pdf, 'application/pdf'),
+}
@@ -0,0 +1,53 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .indexes import recipe_ingredient_index, recipe_search_index
+from .mixins import bump_reference_version
+from .models import POSTGRES, Ingredient, Recipe, RecipeIngredient, Tag
+
+SEARCH_FIELDS = {'name', 'text'}
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    # До фиксации параллельный запрос прочитал бы старые строки и
+    # закэшировал их под новой версией. Индекс поиска каждого воркера
+    # перестроится, увидев новую версию.
+    transaction.on_commit(lambda: bump_reference_version('ingredients'))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(**kwargs):
+    transaction.on_commit(lambda: bump_reference_version('tags'))
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search(instance, update_fields, **kwargs):
+    if update_fields and not SEARCH_FIELDS & set(update_fields):
+        return
+    if POSTGRES:
+        Recipe.objects.filter(pk=instance.pk).update_search_vectors()
+        return
+    transaction.on_commit(lambda: recipe_search_index.update(
+        instance.pk,
+        instance.name,
+        instance.text
+    ))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_from_search(instance, **kwargs):
+    if not POSTGRES:
+        recipe_id = instance.pk
+        transaction.on_commit(
+            lambda: recipe_search_index.remove(recipe_id)
+        )
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def refresh_recipe_ingredients(instance, **kwargs):
+    recipe_id = instance.recipe_id
+    transaction.on_commit(
+        lambda: recipe_ingredient_index.record_change(recipe_id)
+    )
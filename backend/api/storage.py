@@ -0,0 +1,46 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentHashStorage(FileSystemStorage):
+    """
+    Называет файлы по SHA-256 содержимого.
+
+    Одинаковые файлы сохраняются один раз: если файл с таким хэшем уже
+    есть, запись пропускается. Поэтому файл может принадлежать нескольким
+    записям, и удалять его можно только командой collect_media_garbage.
+    """
+
+    def get_hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        content_hash = digest.hexdigest()
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(
+            directory,
+            content_hash[:2],
+            f'{content_hash}{extension}'
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_hashed_name(name, content)
+        try:
+            # Новая ссылка на старый файл: свежее время изменения не даст
+            # collect_media_garbage удалить его до фиксации транзакции.
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return super().save(name, content, max_length)
+        return name.replace('\\', '/')
+
+
+content_hash_storage = ContentHashStorage()
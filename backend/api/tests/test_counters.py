@@ -0,0 +1,44 @@
+import pytest
+from django.db.models.query import QuerySet
+
+
+@pytest.fixture
+def concurrent_delete(monkeypatch):
+    """
+    Перед каждым удалением те же строки удаляет параллельный запрос.
+
+    Счетчик уменьшает он сам, поэтому текущий запрос его не трогает.
+    """
+    delete = QuerySet.delete
+
+    def delete_after_other_request(queryset):
+        delete(queryset._chain())
+        return delete(queryset)
+
+    monkeypatch.setattr(QuerySet, 'delete', delete_after_other_request)
+
+
+@pytest.fixture
+def recipe(author, create_recipe):
+    return create_recipe(author)
+
+
+@pytest.mark.django_db
+def test_concurrent_favorite_delete_is_counted_once(client, recipe,
+                                                    request):
+    url = f'/api/recipes/{recipe.pk}/favorite/'
+    assert client.get(url).status_code == 201
+    request.getfixturevalue('concurrent_delete')
+    assert client.delete(url).status_code == 400
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == 1
+
+
+@pytest.mark.django_db
+def test_concurrent_unsubscribe_is_counted_once(client, author, request):
+    url = f'/api/users/{author.pk}/subscribe/'
+    assert client.get(url).status_code == 201
+    request.getfixturevalue('concurrent_delete')
+    assert client.delete(url).status_code == 400
+    author.refresh_from_db()
+    assert author.subscribers_count == 1
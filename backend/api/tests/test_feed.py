@@ -0,0 +1,40 @@
+import datetime
+
+import pytest
+from api import feed
+from api.models import Recipe
+from users.models import CustomUser, Subscribe
+
+
+@pytest.fixture
+def publish(create_recipe):
+    """count рецептов автора с одной датой публикации."""
+
+    def publish(author, count, day):
+        recipes = [create_recipe(author).pk for _ in range(count)]
+        pub_date = datetime.datetime(
+            2021, 1, day, tzinfo=datetime.timezone.utc
+        )
+        Recipe.objects.filter(pk__in=recipes).update(pub_date=pub_date)
+        return recipes
+
+    return publish
+
+
+def get_feed_ids(user):
+    return set(feed.get_feed(user).values_list('recipe', flat=True))
+
+
+@pytest.mark.django_db
+def test_large_author_recipes_are_pulled_without_gaps(user, author, publish,
+                                                      settings, monkeypatch):
+    settings.FEED_FANOUT_LIMIT = 0
+    settings.FEED_BACKFILL_SIZE = 2
+    monkeypatch.setattr(feed, 'FANOUT_BATCH_SIZE', 3)
+    Subscribe.objects.create(user=user, author=author)
+    CustomUser.objects.filter(pk=author.pk).update(subscribers_count=1)
+    old = publish(author, 2, day=1) + publish(author, 2, day=2)
+    assert get_feed_ids(user) == set(old[2:])
+    # Больше FEED_BACKFILL_SIZE новых, страницы делят одну дату.
+    new = publish(author, 7, day=3) + publish(author, 2, day=4)
+    assert get_feed_ids(user) == set(old[2:] + new)
@@ -0,0 +1,95 @@
+import base64
+import io
+import os
+import time
+
+import pytest
+from api.models import Ingredient, Recipe, RecipeImageJob, Tag
+from api.storage import content_hash_storage
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from PIL import Image
+
+
+def get_jpeg(size=(400, 300)):
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def to_base64(content):
+    return 'data:image/jpeg;base64,' + base64.b64encode(content).decode()
+
+
+@pytest.fixture
+def recipe_data():
+    tag = Tag.objects.create(name='Ужин', color='#123456', slug='dinner')
+    ingredient = Ingredient.objects.create(name='соль', measurement_unit='г')
+    return {
+        'name': 'Рецепт',
+        'text': 'Текст',
+        'cooking_time': 10,
+        'tags': [tag.pk],
+        'ingredients': [{'id': ingredient.pk, 'amount': 5}],
+    }
+
+
+@pytest.mark.django_db
+def test_recipe_with_image(client, recipe_data):
+    response = client.post(
+        '/api/recipes/',
+        {**recipe_data, 'image': to_base64(get_jpeg())},
+        format='json'
+    )
+    assert response.status_code == 201, response.content
+    recipe = Recipe.objects.get()
+    assert recipe.image and recipe.image_preview and recipe.image_card
+
+
+@pytest.mark.django_db
+def test_truncated_image_is_rejected(client, recipe_data):
+    content = get_jpeg()
+    response = client.post(
+        '/api/recipes/',
+        {**recipe_data, 'image': to_base64(content[:len(content) // 2])},
+        format='json'
+    )
+    assert response.status_code == 400
+    assert 'image' in response.json()
+    assert not Recipe.objects.exists()
+
+
+@pytest.mark.django_db
+def test_broken_background_job_fails_without_blocking_queue(
+        client, recipe_data, settings):
+    settings.RECIPE_IMAGE_BACKGROUND = True
+    content = get_jpeg()
+    for payload in (content[:len(content) // 2], content):
+        response = client.post(
+            '/api/recipes/',
+            {**recipe_data, 'image': to_base64(payload)},
+            format='json'
+        )
+        assert response.status_code == 201, response.content
+    call_command('process_image_jobs', '--once', stderr=io.StringIO())
+    broken, valid = Recipe.objects.order_by('pk')
+    assert broken.image_status == Recipe.IMAGE_FAILED
+    job = RecipeImageJob.objects.get()
+    assert job.recipe == broken
+    assert job.status == RecipeImageJob.FAILED
+    assert 'truncated' in job.error
+    assert valid.image_status == Recipe.IMAGE_READY
+    assert valid.image_card
+
+
+@pytest.mark.django_db
+def test_reused_file_is_protected_from_garbage_collection():
+    content = ContentFile(get_jpeg(), 'photo.jpg')
+    name = content_hash_storage.save('recipes/photo.jpg', content)
+    path = content_hash_storage.path(name)
+    old = time.time() - 2 * 60 * 60
+    os.utime(path, (old, old))
+    # Та же фотография загружена заново, транзакция еще не завершена.
+    assert content_hash_storage.save('recipes/other.jpg', content) == name
+    call_command('collect_media_garbage', stdout=io.StringIO())
+    assert os.path.exists(path)
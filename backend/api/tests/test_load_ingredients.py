@@ -0,0 +1,43 @@
+import io
+
+import pytest
+from api.models import Ingredient
+from django.core.management import CommandError, call_command
+
+
+def load(tmp_path, content):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text(content, encoding='utf-8')
+    call_command('load_ingredients', str(path), stdout=io.StringIO())
+
+
+@pytest.mark.django_db
+def test_blank_lines_are_skipped(tmp_path):
+    load(tmp_path, 'name,measurement_unit\nсоль,г\n\n , \nмука,г\n')
+    assert Ingredient.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_short_line_reports_line_number(tmp_path):
+    with pytest.raises(CommandError, match='Строка 3'):
+        load(tmp_path, 'соль,г\nмука,г\nсахар\n')
+
+
+@pytest.mark.django_db
+def test_concurrent_insert_does_not_abort_load(tmp_path, monkeypatch):
+    bulk_create = Ingredient.objects.bulk_create
+
+    def bulk_create_after_other_load(objs, **kwargs):
+        # Параллельная загрузка успела добавить ту же пару.
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        return bulk_create(objs, **kwargs)
+
+    monkeypatch.setattr(
+        Ingredient.objects,
+        'bulk_create',
+        bulk_create_after_other_load
+    )
+    load(tmp_path, 'соль,г\nмука,г\n')
+    assert set(
+        Ingredient.objects.values_list('name', flat=True)
+    ) == {'соль', 'мука'}
@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from django.conf import settings
+from django.test import Client
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess
+
+WORKER = '''
+import os
+import django
+django.setup()
+from django.db import connections
+from foodgram.metrics import RequestMetrics, registry
+connections['default'].ensure_connection()
+registry.observe('Recipe-list', 'GET', 200, 0.1, RequestMetrics(), 10)
+print(os.getpid())
+'''
+
+
+def run_worker(metrics_dir):
+    """Запускает воркер и возвращает его pid."""
+    return subprocess.run(
+        (sys.executable, '-c', WORKER),
+        check=True,
+        cwd=settings.BASE_DIR,
+        env={
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'foodgram.settings',
+            'PROMETHEUS_MULTIPROC_DIR': str(metrics_dir),
+            # Воркеру нужно настоящее соединение, но не общая база.
+            'DB_ENGINE': 'django.db.backends.sqlite3',
+            'DB_NAME': ':memory:',
+        },
+        stdout=subprocess.PIPE,
+        text=True
+    ).stdout.strip()
+
+
+def test_workers_share_metrics(tmp_path):
+    pids = [run_worker(tmp_path), run_worker(tmp_path)]
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=str(tmp_path))
+    body = generate_latest(registry).decode()
+    assert (
+        'foodgram_requests_total{method="GET",status="200",'
+        'view="Recipe-list"} 2.0'
+    ) in body
+    assert 'foodgram_db_connections_opened_total{database="default"} 2.0' in (
+        body
+    )
+    for pid in pids:
+        assert (
+            f'foodgram_db_connections{{database="default",pid="{pid}"}} 1.0'
+        ) in body
+
+
+@pytest.mark.django_db
+def test_metrics_view():
+    client = Client()
+    client.get('/api/tags/')
+    body = client.get('/metrics/').content.decode()
+    assert 'foodgram_requests_total{method="GET",status="200"' in body
+    assert 'foodgram_request_duration_seconds_bucket' in body
+    assert 'foodgram_db_connections{database="default"}' in body
@@ -0,0 +1,17 @@
+import pytest
+from rest_framework.test import APIClient
+
+
+@pytest.mark.django_db
+def test_cursor_pagination_rejects_search(author, create_recipe):
+    create_recipe(author, name='Блины')
+    client = APIClient()
+    response = client.get(
+        '/api/recipes/',
+        {'pagination': 'cursor', 'search': 'блины'}
+    )
+    assert response.status_code == 400
+    assert 'pagination' in response.json()
+    response = client.get('/api/recipes/', {'pagination': 'cursor'})
+    assert response.status_code == 200
+    assert len(response.json()['results']) == 1
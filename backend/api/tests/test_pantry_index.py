@@ -0,0 +1,95 @@
+import pytest
+from api.indexes import RecipeIngredientIndex
+from api.models import RecipeIngredient
+from django.core.cache import cache
+
+
+@pytest.fixture
+def recipes(author, ingredients, create_recipe):
+    return [
+        create_recipe(
+            author,
+            [(ingredient, 1) for ingredient in ingredients[:count]]
+        )
+        for count in (1, 2, 3)
+    ]
+
+
+@pytest.fixture
+def index(monkeypatch):
+    """Индекс другого воркера: после построения не перестраивается."""
+    index = RecipeIngredientIndex()
+    build = index.build
+    builds = []
+
+    def count_builds():
+        builds.append(True)
+        return build()
+
+    monkeypatch.setattr(index, 'build', count_builds)
+    index.builds = builds
+    return index
+
+
+def get_ids(objects):
+    return [obj.pk for obj in objects]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_changes_from_other_workers_are_applied(index, recipes,
+                                                ingredients, settings):
+    settings.INDEX_REFRESH_SECONDS = 0
+    sugar, flour, eggs = get_ids(ingredients)
+    first, second, third = get_ids(recipes)
+    assert index.match([sugar]) == [first, second, third]
+    RecipeIngredient.objects.filter(
+        recipe_id=second, ingredient_id=flour
+    ).delete()
+    RecipeIngredient.objects.create(
+        recipe_id=first, ingredient_id=eggs, amount=1
+    )
+    assert index.match([sugar]) == [second, first, third]
+    assert index.match([flour]) == [third]
+    assert len(index.builds) == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reset_rebuilds_index_in_other_workers(index, recipes, ingredients):
+    sugar = ingredients[0].pk
+    index.match([sugar])
+    RecipeIngredient.objects.filter(recipe=recipes[0]).delete()
+    # Изменение не попало в журнал, как при загрузке seed.
+    cache.delete(index.get_change_key(cache.get(index.version_key)))
+    RecipeIngredientIndex().reset()
+    assert index.match([sugar]) == get_ids(recipes[1:])
+    assert len(index.builds) == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_refresh_touches_only_changed_ingredients(index, recipes,
+                                                  ingredients, monkeypatch):
+    sugar, flour, eggs = get_ids(ingredients)
+    first, second, third = get_ids(recipes)
+    index.match([sugar])
+    discarded = []
+    monkeypatch.setattr(
+        'api.indexes.discard_sorted',
+        lambda values, value: discarded.append(value) or values.remove(value)
+    )
+    for _ in range(5):
+        RecipeIngredient.objects.filter(
+            recipe_id=third, ingredient_id=eggs
+        ).delete()
+        index.refresh([third])
+        RecipeIngredient.objects.create(
+            recipe_id=third, ingredient_id=eggs, amount=1
+        )
+        index.refresh([third])
+    assert discarded == [third] * 5
+    postings, sizes, offsets, compositions = index.get_data()
+    # Старые составы убраны, в массиве не больше двух копий живых.
+    assert len(compositions) <= 2 * sum(sizes)
+    start = offsets[third]
+    assert sorted(compositions[start:start + 3]) == [sugar, flour, eggs]
+    assert index.match([eggs]) == [third]
+    assert index.match([flour]) == [second, third]
@@ -0,0 +1,80 @@
+import pytest
+from api.models import Cart, Favorite, Ingredient, Tag
+from rest_framework.test import APIClient
+from users.models import Subscribe
+
+# Список и рецепт: рецепты, теги, ингредиенты (и для пользователя -
+# авторы с флагом подписки); в списке еще COUNT пагинации.
+LIST_QUERIES = {False: 4, True: 5}
+DETAIL_QUERIES = {False: 3, True: 4}
+
+
+@pytest.fixture
+def create_recipes(user, create_user, create_recipe):
+    """count рецептов двух авторов, в каждом count ингредиентов и теги."""
+
+    def create_recipes(count):
+        authors = [create_user('first'), create_user('second')]
+        Subscribe.objects.create(user=user, author=authors[1])
+        tags = [
+            Tag.objects.create(
+                name=f'Тег {i}', color=f'#00000{i}', slug=f't{i}'
+            )
+            for i in range(3)
+        ]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {i}', measurement_unit='г')
+            for i in range(count)
+        )
+        ingredients = [
+            (ingredient, 1) for ingredient in Ingredient.objects.all()
+        ]
+        recipes = []
+        for number in range(count):
+            recipe = create_recipe(
+                authors[number % 2],
+                ingredients,
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10
+            )
+            recipe.tags.set(tags[:number % 3 + 1])
+            recipes.append(recipe)
+        Favorite.objects.create(owner=user, recipe=recipes[0])
+        Cart.objects.create(owner=user, recipe=recipes[-1])
+        return recipes
+
+    return create_recipes
+
+
+def get_client(user, authenticated):
+    client = APIClient()
+    if authenticated:
+        client.force_authenticate(user)
+    return client
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('authenticated', (False, True))
+@pytest.mark.parametrize('count', (3, 30))
+def test_recipe_list_queries(user, create_recipes, count, authenticated,
+                             django_assert_num_queries):
+    create_recipes(count)
+    client = get_client(user, authenticated)
+    with django_assert_num_queries(LIST_QUERIES[authenticated]):
+        response = client.get(f'/api/recipes/?limit={count}')
+    results = response.json()['results']
+    assert len(results) == count
+    assert all(len(recipe['ingredients']) == count for recipe in results)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('authenticated', (False, True))
+@pytest.mark.parametrize('count', (3, 30))
+def test_recipe_detail_queries(user, create_recipes, count, authenticated,
+                               django_assert_num_queries):
+    recipe = create_recipes(count)[-1]
+    client = get_client(user, authenticated)
+    with django_assert_num_queries(DETAIL_QUERIES[authenticated]):
+        response = client.get(f'/api/recipes/{recipe.pk}/')
+    assert len(response.json()['ingredients']) == count
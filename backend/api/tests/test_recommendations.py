@@ -0,0 +1,59 @@
+import heapq
+import math
+
+import numpy as np
+import pytest
+from api.recommendations import get_similarities
+from scipy import sparse
+
+
+def get_expected(interactions, tags, top, tag_weight, min_common):
+    """Попарный подсчет по определению, для небольших матриц."""
+    users = [set(column.nonzero()[0]) for column in interactions.T]
+    expected = []
+    for recipe, recipe_users in enumerate(users):
+        scores = []
+        for similar, similar_users in enumerate(users):
+            common = len(recipe_users & similar_users)
+            if similar == recipe or not common or common < min_common:
+                continue
+            score = common / math.sqrt(len(recipe_users) * len(similar_users))
+            union = (tags[recipe] | tags[similar]).sum()
+            if tag_weight and union:
+                score = (
+                    (1 - tag_weight) * score
+                    + tag_weight * (tags[recipe] & tags[similar]).sum() / union
+                )
+            scores.append((score, similar))
+        expected.extend(
+            (recipe, similar, score)
+            for score, similar in heapq.nlargest(top, scores)
+        )
+    return expected
+
+
+@pytest.mark.parametrize('tag_weight', (0, 0.3))
+@pytest.mark.parametrize('min_common', (1, 2))
+def test_similarities_match_pairwise_definition(tag_weight, min_common):
+    rng = np.random.default_rng(0)
+    interactions = rng.random((60, 40)) < 0.15
+    interactions[:, 0] = True
+    tags = rng.random((40, 5)) < 0.4
+    pairs = [
+        pair
+        for rows, columns, scores in get_similarities(
+            sparse.csr_matrix(interactions, dtype=np.float32),
+            np.packbits(tags, axis=1),
+            top=3,
+            tag_weight=tag_weight,
+            min_common=min_common,
+            chunk_pairs=50
+        )
+        for pair in zip(rows.tolist(), columns.tolist(), scores.tolist())
+    ]
+    expected = get_expected(interactions, tags, 3, tag_weight, min_common)
+    assert [pair[:2] for pair in pairs] == [pair[:2] for pair in expected]
+    assert np.allclose(
+        [pair[2] for pair in pairs],
+        [pair[2] for pair in expected]
+    )
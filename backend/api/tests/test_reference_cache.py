@@ -0,0 +1,40 @@
+import pytest
+from api.mixins import bump_reference_version, get_reference_version
+from api.models import Ingredient, Tag
+from django.db import transaction
+from rest_framework.test import APIClient
+
+
+@pytest.mark.django_db
+def test_unknown_query_params_share_cache(django_assert_num_queries):
+    Tag.objects.create(name='Завтрак', color='#ffaa00', slug='breakfast')
+    client = APIClient()
+    assert client.get('/api/tags/', {'page': 1}).status_code == 200
+    with django_assert_num_queries(0):
+        response = client.get('/api/tags/', {'page': 2, 'random': 'x'})
+    assert [tag['slug'] for tag in response.json()] == ['breakfast']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_version_changes_after_commit():
+    version = get_reference_version('tags')
+    with transaction.atomic():
+        Tag.objects.create(name='Обед', color='#00aaff', slug='lunch')
+        assert get_reference_version('tags') == version
+    assert get_reference_version('tags') != version
+
+
+@pytest.mark.django_db
+def test_name_search_follows_reference_version(settings):
+    settings.INDEX_REFRESH_SECONDS = 24 * 60 * 60
+    Ingredient.objects.create(name='мука', measurement_unit='г')
+    client = APIClient()
+    assert len(client.get('/api/ingredients/', {'name': 'му'}).json()) == 1
+    # Как load_ingredients или запись в другом воркере: строки без
+    # сигналов этого процесса и новая версия в общем кэше.
+    Ingredient.objects.bulk_create(
+        [Ingredient(name='мускат', measurement_unit='г')]
+    )
+    bump_reference_version('ingredients')
+    response = client.get('/api/ingredients/', {'name': 'му'})
+    assert [item['name'] for item in response.json()] == ['мука', 'мускат']
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+from api.models import Cart
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.core.asgi import get_asgi_application
+from rest_framework.authtoken.models import Token
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+@pytest.fixture
+def cart(user, ingredients, create_recipe):
+    sugar, flour, _ = ingredients
+    for amount in (100, 50):
+        Cart.objects.create(
+            owner=user,
+            recipe=create_recipe(
+                user,
+                ((sugar, amount), (flour, amount * 2))
+            )
+        )
+
+
+def download(client, export_format):
+    response = client.get(URL, {'format': export_format})
+    assert response.status_code == 200
+    return b''.join(response.streaming_content)
+
+
+async def get_asgi_response(scope):
+    """Очереди коммуникатора создаются в цикле, который запускает тест."""
+    communicator = ApplicationCommunicator(get_asgi_application(), scope)
+    await communicator.send_input({'type': 'http.request'})
+    response = await communicator.receive_output()
+    body = b''
+    while True:
+        message = await communicator.receive_output()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return {'status': response['status'], 'body': body}
+
+
+@pytest.mark.django_db
+def test_ingredients_are_summed_and_ordered(client, cart):
+    rows = json.loads(download(client, 'json'))
+    assert rows == [
+        {'name': 'мука', 'measurement_unit': 'г', 'amount': 300},
+        {'name': 'сахар', 'measurement_unit': 'г', 'amount': 150},
+    ]
+
+
+@pytest.mark.django_db
+def test_pdf_export(client, cart):
+    body = download(client, 'pdf')
+    assert body.startswith(b'%PDF')
+    assert body.rstrip().endswith(b'%%EOF')
+    assert b'DejaVuSans' in body
+
+
+@pytest.mark.django_db
+def test_unknown_format(client):
+    assert client.get(URL, {'format': 'xml'}).status_code == 400
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cart_change_during_download_is_not_cached(client, user, cart,
+                                                   ingredients, create_recipe):
+    """Выгрузка, начатая до изменения списка, не кэширует старые строки."""
+    response = client.get(URL, {'format': 'txt'})
+    content = iter(response.streaming_content)
+    next(content)
+    next(content)
+    recipe = create_recipe(user, ((ingredients[2], 3),))
+    response = client.get(f'/api/recipes/{recipe.pk}/shopping_cart/')
+    assert response.status_code == 201
+    assert 'яйца' not in b''.join(content).decode()
+    assert 'яйца - 3 г' in download(client, 'txt').decode()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_download_under_asgi(user, cart):
+    token = Token.objects.create(user=user)
+    response = async_to_sync(get_asgi_response)({
+        'type': 'http',
+        'method': 'GET',
+        'path': URL,
+        'query_string': b'format=json',
+        'headers': [(b'authorization', f'Token {token.key}'.encode())],
+    })
+    assert response['status'] == 200
+    assert json.loads(response['body'])[0]['amount'] == 300
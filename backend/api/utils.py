@@ -0,0 +1,10 @@
+def batched(items, batch_size):
+    """Разбивает итерируемый объект на списки по batch_size элементов."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -1,51 +1,77 @@
-from django.db.models import Sum
-from django.shortcuts import HttpResponse, get_object_or_404
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django_filters import rest_framework as django_filters
+from foodgram.metrics import SerializerTimingMixin
 from rest_framework import status, viewsets
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .filters import IngredientFilter, RecipeFilter
-from .models import Cart, Favorite, Ingredient, Recipe, RecipeIngredient, Tag
+from .feed import get_feed
+from .filters import RecipeFilter
+from .indexes import ingredient_index, recipe_ingredient_index
+from .mixins import CachedReferenceMixin
+from .models import Cart, Favorite, Ingredient, Recipe, Tag
+from .pagination import (LimitFieldCursorPagination, LimitFieldPagination,
+                         OptionalCursorPaginationMixin)
 from .permissions import AdminOrAuthorOrReadOnly
+from .recommendations import get_recommended_ids
 from .serializers import (AddRecipeSerializer, CartSerializer,
                           FavoriteSerializer, IngredientSerializer,
                           RecipeSerializer, TagSerializer)
+from .shopping_cart import (EXPORT_FORMATS, get_shopping_list,
+                            invalidate_recipe_shopping_lists,
+                            invalidate_shopping_lists)
 
+User = get_user_model()
 
-class LimitFieldPagination(PageNumberPagination):
-    page_size_query_param = 'limit'
 
-
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(SerializerTimingMixin, CachedReferenceMixin,
+                 viewsets.ModelViewSet):
     """API тэгов."""
 
+    cache_prefix = 'tags'
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ModelViewSet):
+class IngredientViewSet(SerializerTimingMixin, CachedReferenceMixin,
+                        viewsets.ModelViewSet):
     """API ингредиентов."""
 
+    cache_prefix = 'ingredients'
+    cache_query_params = ('name',)
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
     pagination_class = None
-    filter_backends = (django_filters.DjangoFilterBackend,)
-    filterset_class = IngredientFilter
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name:
+            return Response(ingredient_index.search(name))
+        return super().list(request, *args, **kwargs)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(SerializerTimingMixin, OptionalCursorPaginationMixin,
+                    viewsets.ModelViewSet):
     """API рецептов."""
 
-    queryset = Recipe.objects.all()
     permission_classes = (AdminOrAuthorOrReadOnly,)
     pagination_class = LimitFieldPagination
+    cursor_incompatible_params = ('search',)
     filter_backends = (django_filters.DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        return Recipe.objects.for_user(self.request.user)
+
     def get_serializer_class(self):
         if self.request.method in ('POST', 'PUT', 'PATCH'):
             return AddRecipeSerializer
@@ -54,8 +80,95 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def get_serializer_context(self):
         context = super(RecipeViewSet, self).get_serializer_context()
         context.update({"request": self.request})
+        if self.action in ('list', 'pantry', 'recommended', 'feed'):
+            context['image_variant'] = 'card'
         return context
 
+    def get_pantry_ingredients(self):
+        values = self.request.query_params.getlist('ingredients')
+        try:
+            ingredient_ids = {
+                int(value)
+                for item in values
+                for value in item.split(',')
+                if value
+            }
+        except ValueError:
+            raise ValidationError(
+                {'ingredients': 'Укажите id ингредиентов через запятую.'}
+            )
+        if not ingredient_ids:
+            raise ValidationError(
+                {'ingredients': 'Укажите хотя бы один ингредиент.'}
+            )
+        return ingredient_ids
+
+    @action(detail=False)
+    def pantry(self, request):
+        """
+        Рецепты из имеющихся продуктов: сначала те, для которых есть
+        все ингредиенты, затем по числу недостающих.
+        """
+        ingredient_ids = self.get_pantry_ingredients()
+        paginator, data = self.paginate_recipe_ids(
+            recipe_ingredient_index.match(ingredient_ids)
+        )
+        for recipe in data:
+            recipe['missing_count'] = sum(
+                ingredient['id'] not in ingredient_ids
+                for ingredient in recipe['ingredients']
+            )
+        return paginator.get_paginated_response(data)
+
+    @action(detail=False)
+    def recommended(self, request):
+        """Рекомендации по заранее посчитанной таблице похожих рецептов."""
+        paginator, data = self.paginate_recipe_ids(
+            get_recommended_ids(request.user)
+        )
+        return paginator.get_paginated_response(data)
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        """Новые рецепты авторов из подписок с курсорной пагинацией."""
+        paginator = LimitFieldCursorPagination()
+        items = paginator.paginate_queryset(
+            get_feed(request.user),
+            request,
+            view=self
+        )
+        return paginator.get_paginated_response(
+            self.get_recipes_data([item.recipe_id for item in items])
+        )
+
+    def paginate_recipe_ids(self, recipe_ids):
+        """Страница рецептов по готовому упорядоченному списку id."""
+        paginator = LimitFieldPagination()
+        recipe_ids = paginator.paginate_queryset(
+            recipe_ids,
+            self.request,
+            view=self
+        )
+        return paginator, self.get_recipes_data(recipe_ids)
+
+    def get_recipes_data(self, recipe_ids):
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes],
+            many=True
+        )
+        return serializer.data
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        invalidate_recipe_shopping_lists(instance)
+        _, deleted = instance.delete()
+        # Параллельный DELETE того же рецепта не должен уменьшить счетчик.
+        if deleted.get(Recipe._meta.label):
+            User.objects.filter(pk=instance.author_id).update(
+                recipes_count=F('recipes_count') - 1
+            )
+
 
 class FavoriteView(APIView):
     """API избранных рецептов."""
@@ -74,7 +187,11 @@ class FavoriteView(APIView):
             context=fav_context
         )
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                Recipe.objects.filter(pk=recipe_id).update(
+                    favorites_count=F('favorites_count') + 1
+                )
             return Response(
                 serializer.data,
                 status=status.HTTP_201_CREATED
@@ -87,16 +204,20 @@ class FavoriteView(APIView):
     def delete(self, request, recipe_id):
         cur_user = request.user
         recipe = get_object_or_404(Recipe, id=recipe_id)
-        favorite = Favorite.objects.filter(
-            owner=cur_user,
-            recipe=recipe
-        )
-        if not favorite.exists():
+        with transaction.atomic():
+            deleted, _ = Favorite.objects.filter(
+                owner=cur_user,
+                recipe=recipe
+            ).delete()
+            if deleted:
+                Recipe.objects.filter(pk=recipe.pk).update(
+                    favorites_count=F('favorites_count') - deleted
+                )
+        if not deleted:
             return Response(
                 'Этот рецепт отсутсвует в избранном.',
                 status=status.HTTP_400_BAD_REQUEST
             )
-        favorite.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -115,6 +236,7 @@ class CartView(APIView):
         serializer = CartSerializer(data=req_cart_data, context=cart_context)
         if serializer.is_valid():
             serializer.save()
+            invalidate_shopping_lists((cur_user.id,))
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -131,37 +253,39 @@ class CartView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         cart_qs.delete()
+        invalidate_shopping_lists((cur_user.id,))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class DownloadCart(APIView):
+    """Выгрузка списка покупок в формате txt, csv, json или pdf."""
+
     permission_classes = (IsAuthenticated,)
 
+    def perform_content_negotiation(self, request, force=False):
+        # Параметр format выбирает формат файла, а не рендерер DRF.
+        return super().perform_content_negotiation(request, force=True)
+
     def get(self, request):
-        cur_user = request.user
-        shop_list = {}
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shop_recipes__owner=cur_user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(Sum('amount'))
-        for ingredient in ingredients:
-            amount = ingredient['amount__sum']
-            name = ingredient['ingredient__name']
-            measurement_unit = ingredient['ingredient__measurement_unit']
-            shop_list[name] = {
-                'amount': amount,
-                'measurement_unit': measurement_unit
-            }
-        out_list = ['Foodgram\n\n']
-        for ingr, value in shop_list.items():
-            out_list.append(
-                f" {ingr} - {value['amount']} "
-                f"{value['measurement_unit']}\n"
+        export_format = request.query_params.get('format', 'txt')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                'Доступные форматы: ' + ', '.join(EXPORT_FORMATS),
+                status=status.HTTP_400_BAD_REQUEST
             )
-        response = HttpResponse(out_list, {
-            'Content-Type': 'text/plain',
-            'Content-Disposition': 'attachment; filename="out_list.txt"',
-        })
+        render, content_type = EXPORT_FORMATS[export_format]
+        content = render(get_shopping_list(request.user))
+        if isinstance(request._request, ASGIRequest):
+            # Django 3.0 перебирает потоковый ответ в цикле событий, где
+            # обращения к базе запрещены, поэтому файл собирается здесь,
+            # в потоке представления.
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            response = StreamingHttpResponse(
+                content,
+                content_type=content_type
+            )
+        response['Content-Disposition'] = (
+            f'attachment; filename="out_list.{export_format}"'
+        )
         return response
@@ -0,0 +1,81 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    cache.clear()
+
+
+@pytest.fixture
+def create_user():
+    from users.models import CustomUser
+
+    def create_user(username):
+        return CustomUser.objects.create_user(
+            username=username,
+            email=f'{username}@foodgram.ru',
+            password='password',
+            first_name=username,
+            last_name=username
+        )
+
+    return create_user
+
+
+@pytest.fixture
+def user(create_user):
+    return create_user('reader')
+
+
+@pytest.fixture
+def author(create_user):
+    return create_user('author')
+
+
+@pytest.fixture
+def client(user):
+    from rest_framework.test import APIClient
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def ingredients():
+    from api.models import Ingredient
+    return [
+        Ingredient.objects.create(name=name, measurement_unit='г')
+        for name in ('сахар', 'мука', 'яйца')
+    ]
+
+
+@pytest.fixture
+def create_recipe():
+    """Рецепт с картинкой, ingredients - пары (ингредиент, количество)."""
+    from api.models import Recipe, RecipeIngredient
+    from django.core.files.base import ContentFile
+
+    def create_recipe(author, ingredients=(), **fields):
+        recipe = Recipe(
+            author=author,
+            **{'name': 'Рецепт', 'text': 'Текст', 'cooking_time': 5, **fields}
+        )
+        recipe.image.save('recipe.png', ContentFile(b'png'), save=False)
+        recipe.save()
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredient,
+                amount=amount
+            )
+            for ingredient, amount in ingredients
+        )
+        return recipe
+
+    return create_recipe
@@ -0,0 +1,21 @@
+"""
+ASGI config for foodgram project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+Django 3.0 runs views synchronously in the asgiref thread pool (its size
+is set by the ASGI_THREADS variable). asgiref is pinned to 3.2: starting
+with 3.3 sync_to_async defaults to thread_sensitive=True and every request
+of the worker would be handled by one shared thread.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+
+application = get_asgi_application()
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+class ConnectionHealthCheckMiddleware:
+    """
+    Проверяет постоянные соединения с базой перед запросом.
+
+    Django 3.0 переиспользует соединение без проверки, и запрос падает,
+    если Postgres или pgbouncer уже закрыли его. Соединение, простоявшее
+    без запросов дольше DB_HEALTH_CHECK_SECONDS, пингуется, неработающее
+    закрывается, и запрос открывает новое.
+    """
+
+    def __init__(self, get_response):
+        if not any(
+            database.get('CONN_MAX_AGE')
+            for database in settings.DATABASES.values()
+        ):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        now = time.monotonic()
+        for connection in connections.all():
+            if (
+                connection.connection is not None
+                and now - getattr(connection, 'released_at', now)
+                > settings.DB_HEALTH_CHECK_SECONDS
+                and not connection.is_usable()
+            ):
+                connection.close()
+        try:
+            return self.get_response(request)
+        finally:
+            released_at = time.monotonic()
+            for connection in connections.all():
+                connection.released_at = released_at
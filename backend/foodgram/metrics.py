@@ -0,0 +1,274 @@
+import collections
+import logging
+import os
+import threading
+import time
+import weakref
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_finished
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+logger = logging.getLogger(__name__)
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class RequestMetrics:
+    """Счетчики одного запроса, заодно обертка для execute_wrapper."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.statements = collections.Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.statements[sql] += 1
+
+
+class MetricsRegistry:
+    """
+    Метрики запросов и соединений с базой в prometheus_client.
+
+    Под gunicorn воркеров несколько, поэтому значения пишутся в файлы
+    каталога PROMETHEUS_MULTIPROC_DIR (его задает gunicorn.conf.py), и
+    /metrics/ любого воркера отдает сумму по всем. Без этой переменной,
+    например в runserver, метрики хранятся в памяти процесса.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections = weakref.WeakSet()
+        self.requests = Counter(
+            'foodgram_requests',
+            'Запросы по представлению, методу и статусу.',
+            ('view', 'method', 'status')
+        )
+        self.duration = Histogram(
+            'foodgram_request_duration_seconds',
+            'Время обработки запроса.',
+            ('view',),
+            buckets=DURATION_BUCKETS
+        )
+        self.queries = Counter(
+            'foodgram_db_queries',
+            'SQL-запросы.',
+            ('view',)
+        )
+        self.db_time = Counter(
+            'foodgram_db_duration_seconds',
+            'Время выполнения SQL-запросов.',
+            ('view',)
+        )
+        self.serializer_time = Counter(
+            'foodgram_serializer_duration_seconds',
+            'Время сериализации ответа.',
+            ('view',)
+        )
+        self.response_size = Counter(
+            'foodgram_response_size_bytes',
+            'Размер тел ответов (без потоковых).',
+            ('view',)
+        )
+        self.connections_opened = Counter(
+            'foodgram_db_connections_opened',
+            'Соединения с базой, открытые воркерами.',
+            ('database',)
+        )
+        # liveall: отдельная серия с меткой pid на каждый живой воркер,
+        # чтобы подбирать CONN_MAX_AGE и пул pgbouncer по воркерам.
+        # Серии завершившихся убирает child_exit в gunicorn.conf.py.
+        self.connections = Gauge(
+            'foodgram_db_connections',
+            'Соединения с базой, открытые сейчас.',
+            ('database',),
+            multiprocess_mode='liveall'
+        )
+
+    def connection_created(self, connection):
+        self.connections_opened.labels(connection.alias).inc()
+        with self._lock:
+            self._connections.add(connection)
+        self.update_connections()
+
+    def update_connections(self, current=()):
+        """
+        Число открытых соединений процесса по всем потокам, current -
+        соединения текущего потока, если они открыты до импорта модуля.
+        """
+        with self._lock:
+            self._connections.update(current)
+            connections = list(self._connections)
+        open_connections = collections.Counter(
+            connection.alias
+            for connection in connections
+            if connection.connection is not None
+        )
+        for alias in {connection.alias for connection in connections}:
+            self.connections.labels(alias).set(open_connections[alias])
+
+    def observe(self, view, method, status, duration, metrics, size):
+        self.requests.labels(view, method, status).inc()
+        self.duration.labels(view).observe(duration)
+        self.queries.labels(view).inc(metrics.queries)
+        self.db_time.labels(view).inc(metrics.db_time)
+        self.serializer_time.labels(view).inc(metrics.serializer_time)
+        self.response_size.labels(view).inc(size)
+
+    def render(self):
+        if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+            return generate_latest(REGISTRY)
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+
+
+registry = MetricsRegistry()
+
+
+@receiver(connection_created)
+def track_connection(sender, connection, **kwargs):
+    registry.connection_created(connection)
+
+
+@receiver(request_finished)
+def update_connections(sender, **kwargs):
+    # Подключен позже close_old_connections и видит закрытые им
+    # соединения.
+    registry.update_connections(connections.all())
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name
+
+
+class MetricsMiddleware:
+    """
+    Считает SQL-запросы, время БД и сериализации и размер ответа.
+
+    Итоги уходят в заголовок Server-Timing и в registry, медленные
+    запросы пишутся в лог вместе с самыми повторяющимися SQL.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        duration = time.perf_counter() - started
+        size = 0 if response.streaming else len(response.content)
+        view = get_view_name(request)
+        registry.observe(
+            view,
+            request.method,
+            response.status_code,
+            duration,
+            metrics,
+            size
+        )
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={metrics.db_time * 1000:.1f};'
+            f'desc="{metrics.queries} queries"',
+            f'serialize;dur={metrics.serializer_time * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ))
+        if duration * 1000 >= settings.SLOW_REQUEST_MS:
+            self.log_slow_request(request, view, duration, metrics)
+        return response
+
+    def log_slow_request(self, request, view, duration, metrics):
+        repeated = [
+            f'{count}x {sql[:300]}'
+            for sql, count in metrics.statements.most_common(
+                settings.SLOW_REQUEST_TOP_QUERIES
+            )
+            if count > 1
+        ]
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.0f мс, SQL: %s за %.0f мс, '
+            'сериализация %.0f мс.%s',
+            request.method,
+            request.get_full_path(),
+            view,
+            duration * 1000,
+            metrics.queries,
+            metrics.db_time * 1000,
+            metrics.serializer_time * 1000,
+            ''.join(f'\n  {line}' for line in repeated)
+        )
+
+
+timed_serializer_classes = {}
+
+
+def get_timed_serializer_class(serializer_class):
+    timed_class = timed_serializer_classes.get(serializer_class)
+    if timed_class is None:
+        class TimedSerializer(serializer_class):
+
+            @property
+            def data(self):
+                started = time.perf_counter()
+                try:
+                    return super().data
+                finally:
+                    metrics = current_metrics.get()
+                    if metrics is not None:
+                        metrics.serializer_time += (
+                            time.perf_counter() - started
+                        )
+
+        TimedSerializer.__name__ = serializer_class.__name__
+        TimedSerializer.__qualname__ = serializer_class.__qualname__
+        timed_class = timed_serializer_classes[serializer_class] = (
+            TimedSerializer
+        )
+    return timed_class
+
+
+class SerializerTimingMixin:
+    """Засчитывает время serializer.data в метрики текущего запроса."""
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if current_metrics.get() is not None:
+            serializer.__class__ = get_timed_serializer_class(
+                serializer.__class__
+            )
+        return serializer
+
+
+def metrics_view(request):
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE_LATEST)
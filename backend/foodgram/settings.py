@@ -50,10 +50,12 @@ INSTALLED_APPS = [
     'djoser',
     'django_filters',
     'users',
-    'api',
+    'api.apps.ApiConfig',
 ]
 
 MIDDLEWARE = [
+    'foodgram.metrics.MetricsMiddleware',
+    'foodgram.db.ConnectionHealthCheckMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -95,9 +97,37 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD'),
         'HOST': os.environ.get('DB_HOST'),
         'PORT': os.environ.get('DB_PORT'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        # pgbouncer в режиме transaction не сохраняет курсоры между
+        # транзакциями, поэтому iterator() читает данные без них.
+        'DISABLE_SERVER_SIDE_CURSORS': (
+            os.environ.get('DB_PGBOUNCER') == 'TRUE'
+        ),
     }
 }
 
+DB_HEALTH_CHECK_SECONDS = int(os.environ.get('DB_HEALTH_CHECK_SECONDS', 30))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+SHOPPING_LIST_CACHE_TIMEOUT = int(
+    os.environ.get('SHOPPING_LIST_CACHE_TIMEOUT', 60 * 60)
+)
+
+INDEX_REFRESH_SECONDS = int(os.environ.get('INDEX_REFRESH_SECONDS', 5 * 60))
+
+REFERENCE_CACHE_TIMEOUT = int(
+    os.environ.get('REFERENCE_CACHE_TIMEOUT', 24 * 60 * 60)
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -141,6 +171,19 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'drf_static')
 MEDIA_URL = '/drf_media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'drf_media')
 
+RECIPE_IMAGE_FORMAT = os.environ.get('RECIPE_IMAGE_FORMAT', 'WEBP')
+RECIPE_IMAGE_BACKGROUND = os.environ.get('RECIPE_IMAGE_BACKGROUND') == 'TRUE'
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_PREVIEW_SIZE = (240, 240)
+RECIPE_IMAGE_CARD_SIZE = (760, 760)
+
+FEED_FANOUT_LIMIT = int(os.environ.get('FEED_FANOUT_LIMIT', 1000))
+FEED_BACKFILL_SIZE = 100
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'TRUE') == 'TRUE'
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_TOP_QUERIES = 5
+
 AUTH_USER_MODEL = 'users.CustomUser'
 
 REST_FRAMEWORK = {
@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from .metrics import metrics_view
+
 urlpatterns = [
+    path('metrics/', metrics_view, name='metrics'),
     path('admin/', admin.site.urls),
     path('api/users/', include('users.urls')),
     path('api/', include('djoser.urls')),
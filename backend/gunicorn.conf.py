@@ -0,0 +1,101 @@
+import os
+import shutil
+
+
+def get_cpu_count():
+    """Ядра, доступные процессу, а не всей машине."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+cpu_count = get_cpu_count()
+asgi = os.environ.get('SERVER_MODE') == 'asgi'
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+if asgi:
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+    worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+
+# Синхронному воркеру нужен запас процессов на время ожидания базы,
+# воркер uvicorn ждет базу в пуле потоков, ему хватает одного на ядро.
+workers = int(os.environ.get(
+    'GUNICORN_WORKERS',
+    cpu_count if asgi else cpu_count * 2 + 1
+))
+# При threads > 1 gunicorn сам заменяет sync на gthread.
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+# Django загружается в мастере до форка, воркеры делят его страницы
+# памяти и стартуют быстрее.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'TRUE') == 'TRUE'
+
+# Перезапуск воркеров ограничивает рост памяти, разброс не дает всем
+# воркерам перезапуститься одновременно.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+
+# Воркеры пишут метрики в общий каталог, /metrics/ отдает их сумму.
+# Переменная нужна до импорта prometheus_client, то есть до загрузки
+# приложения.
+metrics_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    '/tmp/foodgram-metrics'
+)
+
+
+def on_starting(server):
+    """Значения прошлого запуска не должны попасть в метрики."""
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def pre_fork(server, worker):
+    """Соединения с базой, открытые в мастере, не должны попасть в воркеры."""
+    if server.cfg.preload_app:
+        from django.db import connections
+        connections.close_all()
+
+
+def child_exit(server, worker):
+    """Соединения завершившегося воркера больше не считаются открытыми."""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def when_ready(server):
+    server.log.info(
+        'Воркеров: %s, потоков: %s, класс: %s, preload: %s',
+        server.cfg.workers,
+        server.cfg.threads,
+        server.cfg.worker_class.__name__,
+        server.cfg.preload_app
+    )
+    check_cache(server)
+
+
+def check_cache(server):
+    """Версии справочников и журнал изменений живут в кэше Django."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    from django.conf import settings
+    backend = settings.CACHES['default']['BACKEND']
+    if server.cfg.workers > 1 and backend.endswith('.LocMemCache'):
+        server.log.warning(
+            'Кэш %s у каждого воркера свой: изменения справочников и '
+            'составов рецептов дойдут только до одного из %s воркеров. '
+            'Укажите общий кэш в CACHE_BACKEND.',
+            backend,
+            server.cfg.workers
+        )
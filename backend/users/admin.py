@@ -12,7 +12,9 @@ class UserAdmin(BaseUserAdmin):
         'email',
         'first_name',
         'last_name',
-        'role'
+        'role',
+        'recipes_count',
+        'subscribers_count'
     )
     fieldsets = (
         ('Основные поля', {'fields': (
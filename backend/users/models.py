@@ -1,11 +1,31 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
+from django.db.models import Exists, OuterRef, Value
 from django.db.models.constraints import UniqueConstraint
 
 username_validator = UnicodeUsernameValidator()
 
 
+class CustomUserQuerySet(models.QuerySet):
+
+    def with_is_subscribed(self, user):
+        """Добавляет флаг подписки пользователя user на каждого автора."""
+        if user.is_anonymous:
+            return self.annotate(
+                is_subscribed=Value(False, models.BooleanField())
+            )
+        return self.annotate(
+            is_subscribed=Exists(
+                Subscribe.objects.filter(user=user, author=OuterRef('pk'))
+            )
+        )
+
+
+class CustomUserManager(UserManager.from_queryset(CustomUserQuerySet)):
+    pass
+
+
 class CustomUser(AbstractUser):
     ADMIN = 'admin'
     USER = 'user'
@@ -24,6 +44,18 @@ class CustomUser(AbstractUser):
         choices=ROLE,
         default=USER
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов'
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков'
+    )
+
+    objects = CustomUserManager()
 
     @property
     def is_admin(self):
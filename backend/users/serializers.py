@@ -12,6 +12,8 @@ class CustomUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         cur_user = self.context['request'].user
         if cur_user.is_anonymous:
             return False
@@ -36,9 +38,6 @@ class CustomUserSerializer(UserSerializer):
 class UserWithRecipesSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField('get_recipes')
-    recipes_count = serializers.SerializerMethodField(
-        'get_recipes_count'
-    )
 
     class Meta:
         model = User
@@ -54,6 +53,8 @@ class UserWithRecipesSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         cur_user = self.context['request'].user
         if cur_user.is_anonymous:
             return False
@@ -65,11 +66,14 @@ class UserWithRecipesSerializer(UserSerializer):
 
     def get_recipes(self, obj):
         from api.serializers import PreviewRecipeSerializer
-        try:
-            limit = self.context['request'].query_params['recipes_limit']
-            qs = obj.recipes.all()[:int(limit)]
-        except Exception:
-            qs = obj.recipes.all()
+        if hasattr(obj, 'preview_recipes'):
+            qs = obj.preview_recipes
+        else:
+            try:
+                limit = self.context['request'].query_params['recipes_limit']
+                qs = obj.recipes.all()[:int(limit)]
+            except Exception:
+                qs = obj.recipes.all()
         serializer = PreviewRecipeSerializer(
             instance=qs,
             many=True,
@@ -79,10 +83,6 @@ class UserWithRecipesSerializer(UserSerializer):
         )
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        qs = obj.recipes.all()
-        return qs.count()
-
 
 class SubscriptionSerializer(serializers.ModelSerializer):
     class Meta:
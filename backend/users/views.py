@@ -1,6 +1,14 @@
-from api.views import LimitFieldPagination
+from api.feed import backfill_feed, remove_from_feed
+from api.models import Recipe
+from api.pagination import (LimitFieldPagination,
+                            OptionalCursorPaginationMixin,
+                            SubscriptionCursorPagination)
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import (BooleanField, F, OuterRef, Prefetch, Subquery,
+                              Value)
 from django.shortcuts import get_object_or_404
+from foodgram.metrics import SerializerTimingMixin
 from rest_framework import status
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
@@ -28,7 +36,12 @@ class SubscribeView(APIView):
             context=sub_context
         )
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                User.objects.filter(pk=user_id).update(
+                    subscribers_count=F('subscribers_count') + 1
+                )
+                backfill_feed(cur_user, user_id)
             return Response(
                 serializer.data,
                 status=status.HTTP_201_CREATED
@@ -41,24 +54,29 @@ class SubscribeView(APIView):
     def delete(self, request, user_id):
         cur_user = request.user
         author = get_object_or_404(User, id=user_id)
-        if not Subscribe.objects.filter(
+        with transaction.atomic():
+            deleted, _ = Subscribe.objects.filter(
                 user=cur_user,
                 author=author
-        ).exists():
+            ).delete()
+            if deleted:
+                User.objects.filter(pk=author.pk).update(
+                    subscribers_count=F('subscribers_count') - deleted
+                )
+                remove_from_feed(cur_user, author)
+        if not deleted:
             return Response(
                 'Автора нет в подписках.',
                 status=status.HTTP_400_BAD_REQUEST
             )
-        Subscribe.objects.filter(
-            user=cur_user,
-            author=author
-        ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class SubscriptionsView(ListAPIView):
+class SubscriptionsView(SerializerTimingMixin, OptionalCursorPaginationMixin,
+                        ListAPIView):
     permission_classes = (IsAuthenticated,)
     pagination_class = LimitFieldPagination
+    cursor_pagination_class = SubscriptionCursorPagination
     serializer_class = UserWithRecipesSerializer
 
     def get_serializer_context(self):
@@ -66,8 +84,28 @@ class SubscriptionsView(ListAPIView):
         context.update({'request': self.request})
         return context
 
+    def get_recipes_limit(self):
+        try:
+            recipes_limit = int(self.request.query_params['recipes_limit'])
+        except (KeyError, ValueError):
+            return None
+        return recipes_limit if recipes_limit >= 0 else None
+
     def get_queryset(self):
         cur_user = self.request.user
+        recipes = Recipe.objects.all()
+        recipes_limit = self.get_recipes_limit()
+        if recipes_limit is not None:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:recipes_limit]
+            ))
         return User.objects.filter(
             subscribing__user=cur_user
+        ).annotate(
+            is_subscribed=Value(True, BooleanField()),
+            subscription_id=F('subscribing__id')
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='preview_recipes')
         )